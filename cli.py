@@ -10,7 +10,8 @@ from llm_chat.core.domain.message import Message
 load_dotenv()
 
 async def main():
-    chat = Chat("First chat")
+    # the CLI keeps generated images on disk, in the current directory
+    chat = Chat("First chat", save_dir=".")
     while True:
         user_text = input("Enter message: ")
         if user_text.lower() == "exit":
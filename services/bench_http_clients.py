@@ -0,0 +1,98 @@
+"""
+Per-call latency of an inter-service request: a new httpx.AsyncClient per
+call (old behaviour) vs a pooled client from ClientRegistry.
+
+    python -m services.bench_http_clients [--url http://localhost:8001/v1/docs] [--calls 2000] [--concurrency 20]
+
+Without --url a minimal keep-alive HTTP server is started in-process, so
+the numbers show the client-side cost alone (connection setup, client
+construction). Against a real upstream over TLS or a network hop the gap
+grows by the handshake round trips saved.
+"""
+import time
+import asyncio
+import argparse
+from typing import List
+
+import httpx
+
+from .http_clients import ClientRegistry
+
+_RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 11\r\n\r\n{\"ok\":true}"
+
+
+async def _serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            if not head:
+                break
+            writer.write(_RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def _pct(samples: List[float], p: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * p))] * 1000 if s else 0.0
+
+
+async def _drive(calls: int, concurrency: int, call) -> List[float]:
+    latencies: List[float] = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with sem:
+            start = time.perf_counter()
+            r = await call()
+            latencies.append(time.perf_counter() - start)
+            r.raise_for_status()
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", help="upstream URL to GET (default: in-process server)")
+    ap.add_argument("--calls", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=20)
+    args = ap.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = await asyncio.start_server(_serve, "127.0.0.1", 0)
+        url = "http://127.0.0.1:%d/" % server.sockets[0].getsockname()[1]
+
+    async def per_request():
+        async with httpx.AsyncClient(timeout=5.0, trust_env=False) as client:
+            return await client.get(url)
+
+    registry = ClientRegistry()
+    registry.register("bench", url, timeout=5.0, trust_env=False)
+    registry.start()
+
+    async def pooled():
+        return await registry.get("bench").get("")
+
+    print(f"url={url} calls={args.calls} concurrency={args.concurrency}")
+    try:
+        for name, call in (("per-request client", per_request), ("pooled client", pooled)):
+            start = time.perf_counter()
+            lat = await _drive(args.calls, args.concurrency, call)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>19}: {args.calls / elapsed:>8.0f} req/s  "
+                  f"p50={_pct(lat, .5):.2f}ms p95={_pct(lat, .95):.2f}ms p99={_pct(lat, .99):.2f}ms")
+    finally:
+        await registry.aclose()
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
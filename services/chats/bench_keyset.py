@@ -0,0 +1,104 @@
+"""
+list_messages page latency vs depth in one chat: OFFSET paging vs the
+keyset query of list_messages (served by ix_messages_chat_created_id_live).
+
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m services.chats.bench_keyset [messages] [limit]
+    DATABASE_URL=postgresql+asyncpg://... python -m services.chats.bench_keyset 1000000
+
+The chat is seeded once (default 1,000,000 messages, every two sharing a
+created_at to exercise ties) and reused by later runs against the same
+database. Keyset latency should stay flat with depth; OFFSET grows linearly.
+"""
+import sys
+import time
+import uuid
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Tuple
+
+from sqlalchemy import select, func, desc, delete, insert, tuple_
+
+from .db.session import SessionLocal, engine, init_db
+from .models.chat import Chat as ChatModel
+from .models.chat_member import ChatMember  # noqa: F401  (mapper of Chat.members)
+from .models.message import Message as MessageModel
+from .core.domain.mytypes import Role
+
+BENCH_CHAT_ID = uuid.uuid5(uuid.NAMESPACE_URL, "llmchat/bench_keyset")
+SEED_BATCH = 10_000
+ROUNDS = 5
+
+
+async def _seed(n: int) -> None:
+    async with SessionLocal() as db:
+        have = await db.scalar(select(func.count()).select_from(MessageModel).where(MessageModel.chat_id == BENCH_CHAT_ID))
+        if have == n:
+            return
+        print(f"seeding {n} messages...")
+        await db.execute(
+            delete(MessageModel).where(MessageModel.chat_id == BENCH_CHAT_ID),
+            execution_options={"synchronize_session": False},
+        )
+        if await db.get(ChatModel, BENCH_CHAT_ID) is None:
+            db.add(ChatModel(id=BENCH_CHAT_ID, title="bench", created_by=BENCH_CHAT_ID))
+            await db.flush()
+        base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for start in range(0, n, SEED_BATCH):
+            await db.execute(insert(MessageModel), [
+                {
+                    "id": uuid.uuid5(BENCH_CHAT_ID, str(i)), "chat_id": BENCH_CHAT_ID, "role": Role.USER,
+                    "text": f"message {i}", "created_at": base + timedelta(milliseconds=i // 2),
+                    "is_deleted": False,
+                }
+                for i in range(start, min(n, start + SEED_BATCH))
+            ])
+        await db.commit()
+
+
+def _page():
+    return select(MessageModel).where(MessageModel.chat_id == BENCH_CHAT_ID, MessageModel.is_deleted == False)
+
+
+async def _cursor_at(depth: int) -> Tuple[datetime, uuid.UUID]:
+    """(created_at, id) of the last message on the page before `depth`, newest first."""
+    async with SessionLocal() as db:
+        row = (await db.execute(
+            select(MessageModel.created_at, MessageModel.id)
+            .where(MessageModel.chat_id == BENCH_CHAT_ID, MessageModel.is_deleted == False)
+            .order_by(desc(MessageModel.created_at), desc(MessageModel.id))
+            .offset(depth - 1).limit(1)
+        )).one()
+        return row.created_at, row.id
+
+
+async def _timed(q) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        async with SessionLocal() as db:
+            start = time.perf_counter()
+            (await db.execute(q)).scalars().all()
+            best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    await init_db()
+    await _seed(n)
+
+    order = (desc(MessageModel.created_at), desc(MessageModel.id))
+    key = tuple_(MessageModel.created_at, MessageModel.id)
+    depths = sorted({d for d in (limit, 1_000, 10_000, 100_000, n // 2, n - limit) if limit <= d <= n - limit})
+
+    print(f"db={engine.url.get_backend_name()} messages={n} page={limit} (best of {ROUNDS})")
+    print(f"{'depth':>9} {'offset ms':>10} {'keyset ms':>10}")
+    for depth in depths:
+        offset_ms = await _timed(_page().order_by(*order).offset(depth).limit(limit))
+        keyset_ms = await _timed(_page().where(key < await _cursor_at(depth)).order_by(*order).limit(limit))
+        print(f"{depth:>9} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
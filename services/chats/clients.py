@@ -0,0 +1,13 @@
+import os
+from ..http_clients import ClientRegistry
+
+USERS_SERVICE_BASE = os.getenv("USERS_SERVICE_BASE", "http://users:8000")
+NONCE_SERVICE_BASE = os.getenv("NONCE_SERVICE_BASE", "http://nonce-service:8000")
+MEDIA_SERVICE_BASE = os.getenv("MEDIA_SERVICE_BASE", "http://media-service:8000")
+MEDIA_READ_BASE = os.getenv("MEDIA_READ_BASE", "http://185.106.95.104:8000/v1")
+
+clients = ClientRegistry()
+clients.register("users", USERS_SERVICE_BASE, timeout=5.0)
+clients.register("nonce", NONCE_SERVICE_BASE, timeout=5.0, trust_env=False)
+clients.register("media", MEDIA_SERVICE_BASE, timeout=30.0, trust_env=False)
+clients.register("media_read", MEDIA_READ_BASE, timeout=15.0, trust_env=False)
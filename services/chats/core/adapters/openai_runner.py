@@ -1,5 +1,5 @@
 from typing import Optional, Any
-from agents import Agent, Runner, ModelSettings
+from agents import Agent, Runner, ModelSettings, RunResultStreaming
 from .image_tool import image_generation_tool
 
 def build_agent() -> Agent:
@@ -13,3 +13,6 @@ def build_agent() -> Agent:
 
 async def run_turn(agent: Agent, input_payload: Any, previous_response_id: Optional[str]) -> Any:
     return await Runner.run(agent, input=input_payload, previous_response_id=previous_response_id)
+
+def run_turn_streamed(agent: Agent, input_payload: Any, previous_response_id: Optional[str]) -> RunResultStreaming:
+    return Runner.run_streamed(agent, input=input_payload, previous_response_id=previous_response_id)
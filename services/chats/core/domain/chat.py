@@ -1,14 +1,16 @@
 import uuid
-from typing import Optional, Union
-from .mytypes import Role
+from typing import Any, AsyncIterator, Optional, Tuple, Union
+from .mytypes import Role, StreamEvent
 from .message import Message
-from ..adapters.openai_runner import build_agent, run_turn
+from ..adapters.openai_runner import build_agent, run_turn, run_turn_streamed
 
 class Chat:
-    def __init__(self, name: str, previous_response_id: Optional[str] = None):
+    def __init__(self, name: str, previous_response_id: Optional[str] = None, save_dir: Optional[str] = None):
         self.uuid: uuid.UUID = uuid.uuid4()
         self.previous_response_id: Optional[str] = previous_response_id
         self.name: str = name
+        # where generated images are written to disk; None keeps them in memory only
+        self.save_dir: Optional[str] = save_dir
         self.agent = build_agent()
 
     async def send(self, message: Union[str, Message]) -> Message:
@@ -16,6 +18,30 @@ class Chat:
             inp = await message.get_input()
             result = await run_turn(self.agent, inp, self.previous_response_id)
             self.previous_response_id = getattr(result, "last_response_id", None)
-            return Message.from_result(result, role=Role.ASSISTANT)
+            return Message.from_result(result, role=Role.ASSISTANT, save_dir=self.save_dir)
         # Auto-wrap plain text
         return await self.send(Message(Role.USER, text=str(message)))
+
+    async def stream(self, message: Union[str, Message]) -> AsyncIterator[Tuple[StreamEvent, Any]]:
+        """
+        Same as send(), but yields events while the model is generating:
+        (DELTA, text chunk), (IMAGE, image generation status) and finally
+        (DONE, assistant Message) once the turn is complete.
+        """
+        if not isinstance(message, Message):
+            message = Message(Role.USER, text=str(message))
+
+        inp = await message.get_input()
+        result = run_turn_streamed(self.agent, inp, self.previous_response_id)
+        async for event in result.stream_events():
+            if event.type != "raw_response_event":
+                continue
+            kind = getattr(event.data, "type", "")
+            if kind == "response.output_text.delta":
+                yield StreamEvent.DELTA, event.data.delta
+            elif kind.startswith("response.image_generation_call."):
+                # in_progress / generating / partial_image / completed
+                yield StreamEvent.IMAGE, kind.rsplit(".", 1)[-1]
+
+        self.previous_response_id = getattr(result, "last_response_id", None)
+        yield StreamEvent.DONE, Message.from_result(result, role=Role.ASSISTANT, save_dir=self.save_dir)
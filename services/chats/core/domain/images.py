@@ -1,48 +1,57 @@
+import os
 import base64
 import uuid
 from typing import Optional, Dict
 from PIL import Image as PILImage
 
 class Image:
-    def __init__(self, data: str, output_format: str, size: str) -> None:
+    """Image held in memory as raw (decoded) bytes."""
+    def __init__(self, content: bytes, output_format: str, size: str) -> None:
         self.uuid: uuid.UUID = uuid.uuid4()
         self.type: str = "BaseImage"
-        self.data: str = data
+        self.content: bytes = content
         self.output_format: str = output_format
         self.size: str = size
         self.path: Optional[str] = None
 
+    @property
+    def data(self) -> str:
+        """Base64 of the content, for data URLs."""
+        return base64.b64encode(self.content).decode("utf-8")
+
     def save(self, directory: str = "") -> None:
-        path: str = directory + self.uuid.hex + "." + self.output_format
+        """Explicitly persist the image to disk (blocking; meant for the CLI)."""
+        path: str = os.path.join(directory, self.uuid.hex + "." + self.output_format)
         with open(path, "wb") as file:
-            file.write(base64.b64decode(self.data))
+            file.write(self.content)
         self.path = path
 
     def get_path(self) -> Optional[str]:
         return self.path
 
-    def get_input(self) -> Dict[str, str]:
+    async def get_input(self) -> Dict[str, str]:
         return {
             "type": "input_image",
-            "image_url": f"data:image/{img.output_format};base64,{img.data}",
+            "image_url": f"data:image/{self.output_format};base64,{self.data}",
         }
 
     def __str__(self) -> str:
         return f"{self.type}(path={self.get_path()})"
 
 class GenImage(Image):
-    def __init__(self, quality: str, prompt: str, data: str, output_format: str, size: str) -> None:
-        super().__init__(data=data, output_format=output_format, size=size)
+    def __init__(self, quality: str, prompt: str, content: bytes, output_format: str, size: str) -> None:
+        super().__init__(content=content, output_format=output_format, size=size)
         self.type = "GenImage"
         self.quality: str = quality
         self.prompt: str = prompt
 
     @classmethod
     def from_item(cls, item) -> "GenImage":
+        # the only base64 decode of a generated image
         return cls(
             quality=item.raw_item.quality,
             prompt=item.raw_item.revised_prompt,
-            data=item.raw_item.result,
+            content=base64.b64decode(item.raw_item.result),
             output_format=item.raw_item.output_format,
             size=item.raw_item.size,
         )
@@ -54,8 +63,8 @@ class GenImage(Image):
         return f"{self.type}(path={self.get_path()}, prompt={self.get_prompt()})"
 
 class InputImage(Image):
-    def __init__(self, data: str, output_format: str, size: str) -> None:
-        super().__init__(data, output_format, size)
+    def __init__(self, content: bytes, output_format: str, size: str) -> None:
+        super().__init__(content, output_format, size)
         self.type = "InputImage"
 
     @classmethod
@@ -65,6 +74,5 @@ class InputImage(Image):
         size: str = f"{w}x{h}"
         output_format: str = path.split(".")[-1]
         with open(path, "rb") as file:
-            data: str = base64.b64encode(file.read()).decode("utf-8")
-        return cls(data, output_format, size)
-
+            content: bytes = file.read()
+        return cls(content, output_format, size)
@@ -1,9 +1,31 @@
+import os
+import re
+import time
 import uuid
-import httpx
 import mimetypes
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+from ...clients import clients
+from ....cache import TTLCache
 
-BASE_URL = "http://185.106.95.104:8000/v1"
+# resized variant requested from the media service for model input ("" = original)
+LLM_IMAGE_VARIANT = os.getenv("LLM_IMAGE_VARIANT", "llm")
+
+
+# media_id -> (etag, metadata, fresh until); revalidated with If-None-Match once stale
+MEDIA_META_CACHE_SIZE = int(os.getenv("MEDIA_META_CACHE_SIZE", "10000"))
+MEDIA_META_CACHE_TTL = float(os.getenv("MEDIA_META_CACHE_TTL", "3600"))  # seconds kept for revalidation
+meta_cache = TTLCache(MEDIA_META_CACHE_SIZE)
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def _max_age(cache_control: str) -> int:
+    m = _MAX_AGE.search(cache_control or "")
+    return int(m.group(1)) if m else 0
+
+
+def _variant_params() -> Dict[str, str]:
+    return {"variant": LLM_IMAGE_VARIANT} if LLM_IMAGE_VARIANT else {}
 
 def mime_to_ext(mime_type: str) -> str:
     """Convert MIME type (image/png) → extension (png)."""
@@ -32,36 +54,67 @@ class MediaImage:
         self.size_str: Optional[str] = None
 
     async def get_url(self) -> str:
-        """Fetch a fresh presigned URL each time."""
-        async with httpx.AsyncClient(base_url=BASE_URL, timeout=15.0, trust_env=False) as client:
-            resp = await client.get(f"/media/{self.media_id}/url")
-            if resp.is_error:
-                raise RuntimeError(f"Failed to get URL: {resp.status_code} {resp.text}")
-
-            data = resp.json()
-            url = data.get("url")
-            if not url:
-                raise RuntimeError("Malformed response: no 'url'")
-            return url
+        """Fetch a fresh presigned URL each time (of the LLM_IMAGE_VARIANT variant)."""
+        resp = await clients.get("media_read").get(f"/media/{self.media_id}/url", params=_variant_params())
+        if resp.is_error:
+            raise RuntimeError(f"Failed to get URL: {resp.status_code} {resp.text}")
+
+        data = resp.json()
+        url = data.get("url")
+        if not url:
+            raise RuntimeError("Malformed response: no 'url'")
+        return url
+
+    @classmethod
+    async def get_urls(cls, images: List["MediaImage"]) -> Dict[uuid.UUID, str]:
+        """Fetch fresh presigned URLs for many images in a single request."""
+        resp = await clients.get("media_read").post(
+            "/media/urls", json={"ids": [str(img.media_id) for img in images], **_variant_params()}
+        )
+        if resp.is_error:
+            raise RuntimeError(f"Failed to get URLs: {resp.status_code} {resp.text}")
+        return {uuid.UUID(item["media_id"]): item["url"] for item in resp.json().get("urls", [])}
+
+    async def _fetch_meta(self) -> Dict:
+        """
+        Metadata from the media service, honouring its caching headers:
+        fresh entries (Cache-Control max-age) are used without a request,
+        stale ones are revalidated with If-None-Match.
+        """
+        cached = meta_cache.get(self.media_id)
+        if cached is not None and cached[2] > time.monotonic():
+            return cached[1]
+
+        headers = {"If-None-Match": cached[0]} if cached is not None and cached[0] else {}
+        resp = await clients.get("media_read").get(f"/media/{self.media_id}", headers=headers)
+        if resp.status_code == 304 and cached is not None:
+            meta = cached[1]
+        elif resp.is_error:
+            meta_cache.pop(self.media_id)
+            raise RuntimeError(f"Failed to get metadata: {resp.status_code} {resp.text}")
+        else:
+            meta = resp.json()
+
+        fresh_until = time.monotonic() + _max_age(resp.headers.get("cache-control", ""))
+        meta_cache.set(self.media_id, (resp.headers.get("etag"), meta, fresh_until), MEDIA_META_CACHE_TTL)
+        return meta
 
     async def load_meta(self) -> None:
         """Load image metadata (mime type, size, etc.) from the media service."""
-        async with httpx.AsyncClient(base_url=BASE_URL, timeout=15.0, trust_env=False) as client:
-            resp = await client.get(f"/media/{self.media_id}")
-            if resp.is_error:
-                raise RuntimeError(f"Failed to get metadata: {resp.status_code} {resp.text}")
-
-            meta: Dict = resp.json()
-            self.mime_type = meta.get("mime_type")
-            self.output_format = mime_to_ext(self.mime_type or "")
-            self.width = meta.get("width")
-            self.height = meta.get("height")
-            if self.width and self.height:
-                self.size_str = f"{self.width}x{self.height}"
+        meta = await self._fetch_meta()
+        self.mime_type = meta.get("mime_type")
+        self.output_format = mime_to_ext(self.mime_type or "")
+        self.width = meta.get("width")
+        self.height = meta.get("height")
+        if self.width and self.height:
+            self.size_str = f"{self.width}x{self.height}"
 
     async def get_input(self) -> Dict[str, str]:
         """Return data for sending to LLM (for example, as OpenAI input_image)."""
-        url = await self.get_url()
+        return self.input_for_url(await self.get_url())
+
+    @staticmethod
+    def input_for_url(url: str) -> Dict[str, str]:
         return {
             "type": "input_image",
             "image_url": url,
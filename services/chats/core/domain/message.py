@@ -1,9 +1,13 @@
-import random
+import os
+import asyncio
 from typing import List, Optional, Dict, Any
 from .mytypes import Role
 from .images import Image, GenImage
 from .media_images import MediaImage
 
+# max images resolved at the same time when they can't be batched
+MEDIA_RESOLVE_CONCURRENCY = int(os.getenv("MEDIA_RESOLVE_CONCURRENCY", "8"))
+
 class Message:
     def __init__(self, role: Role, text: str, images: Optional[List[Image | MediaImage]] = None):
         self.text: str = text
@@ -17,15 +21,34 @@ class Message:
         return self.text
 
     async def get_input(self) -> List[Dict[str, str]]:
-        content: List[Dict[str, str]] = []
-        for img in self.images:
-            content.append(await img.get_input())
+        # all media-service images in one batch request; fall back to one request per image
+        urls: Dict[Any, str] = {}
+        media = [img for img in self.images if isinstance(img, MediaImage)]
+        if len(media) > 1:
+            try:
+                urls = await MediaImage.get_urls(media)
+            except Exception:
+                urls = {}
+
+        sem = asyncio.Semaphore(MEDIA_RESOLVE_CONCURRENCY)
+
+        async def resolve(img: Image | MediaImage) -> Dict[str, str]:
+            if isinstance(img, MediaImage) and img.media_id in urls:
+                return MediaImage.input_for_url(urls[img.media_id])
+            async with sem:
+                return await img.get_input()
+
+        content: List[Dict[str, str]] = list(await asyncio.gather(*(resolve(img) for img in self.images)))
         if self.text:
             content.append({"type": "input_text", "text": self.text})
         return [{"role": str(self.role), "content": content}]
 
     @classmethod
-    def from_result(cls, result, role: Role = Role.ASSISTANT) -> "Message":
+    def from_result(cls, result, role: Role = Role.ASSISTANT, save_dir: Optional[str] = None) -> "Message":
+        """
+        Build a message from a run result. Generated images stay in memory;
+        pass save_dir to also write them to disk.
+        """
         text = result.final_output if isinstance(result.final_output, str) else ""
         mess = Message(role, text)
         for item in getattr(result, "new_items", []):
@@ -35,9 +58,9 @@ class Message:
                 and item.raw_item.type == "image_generation_call"
                 and item.raw_item.result
             ):
-                # Save with a randomized prefix to avoid collisions
                 img = GenImage.from_item(item)
-                img.save("test" + str(random.randint(0, 2**32 - 1)))
+                if save_dir is not None:
+                    img.save(save_dir)
                 mess.attach_image(img)
         return mess
 
@@ -4,3 +4,8 @@ class Role(StrEnum):
     USER = "user"
     ASSISTANT = "assistant"
     SYSTEM = "system"
+
+class StreamEvent(StrEnum):
+    DELTA = "delta"
+    IMAGE = "image"
+    DONE = "done"
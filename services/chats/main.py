@@ -3,6 +3,12 @@ load_dotenv()
 
 from .chats import router as crouter
 from .messages import router as mrouter
+from .turns import router as trouter, execute_turn, recover_turns, fail_stale_turns
+from .worker import turn_pool, TURN_QUEUE_BACKEND
+from .clients import clients
+from .nonces import nonce_pool
+from .utils import verification_cache, verification_flights
+from .messages import gen_upload_stats
 from .db.session import init_db
 from fastapi import FastAPI
 
@@ -11,7 +17,26 @@ app = FastAPI(title="Chats Service")
 @app.on_event("startup")
 async def on_startup() -> None:
     await init_db()
+    clients.start()
+    # the in-process queue is empty after a restart: re-enqueue everything still QUEUED
+    await recover_turns(turn_pool.queue, requeue_all=TURN_QUEUE_BACKEND == "local")
+    turn_pool.start(execute_turn, reaper=fail_stale_turns)
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await turn_pool.stop()
+    await nonce_pool.close()
+    await clients.aclose()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> dict:
+    return {
+        "verification_cache": verification_cache.stats(),
+        "verification_flights": verification_flights.stats(),
+        "generated_image_uploads": gen_upload_stats,
+        "nonce_pool": nonce_pool.stats(),
+    }
 
 app.include_router(crouter, prefix="/v1/chats")
 app.include_router(mrouter, prefix="/v1/chats")
-
+app.include_router(trouter, prefix="/v1/chats")
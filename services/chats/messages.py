@@ -1,21 +1,26 @@
 # app/api/routes/messages.py
-import httpx
+import json
 import time
+import asyncio
+import logging
 import base64
 import jwt
 import uuid
 import os
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
 from uuid import UUID
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, exists
+from sqlalchemy import select, desc, exists, update, tuple_
 from sqlalchemy.orm import selectinload
 
 from .utils import get_current_user
-from .db.session import get_db
+from .clients import clients
+from .nonces import acquire_nonce
+from .db.session import get_db, SessionLocal
 from ..schemas.users import UserOut
 from .schemas.chat_member import ChatMemberOut
 from .models.chat_member import ChatMember
@@ -25,15 +30,29 @@ from .core.domain.message import Message
 from .core.domain.media_images import MediaImage
 from .core.domain.images import GenImage
 from .core.domain.chat import Chat
-from .core.domain.mytypes import Role as MessageRole
+from .core.domain.mytypes import Role as MessageRole, StreamEvent
 from .models.chat import Chat as ChatModel
+from .models.turn import Turn
 from .schemas.message import MessageCreate, MessageOut
+from .schemas.turn import TurnOut, TurnStatus
+from .worker import turn_pool, QueueFull
 
 
-NONCE_SERVICE_BASE = os.getenv("NONCE_SERVICE_BASE", "http://nonce-service:8000")
 JWT_DEV_SECRET = os.getenv("JWT_DEV_SECRET", "dev-secret")
 JWT_ALG = os.getenv("JWT_ALG", "HS256")
-MEDIA_SERVICE_BASE = os.getenv("MEDIA_SERVICE_BASE", "http://media-service:8000")
+GEN_UPLOAD_CONCURRENCY = int(os.getenv("GEN_UPLOAD_CONCURRENCY", "4"))
+
+logger = logging.getLogger(__name__)
+
+# total upload time of generated images, per turn (exposed on /metrics)
+gen_upload_stats = {
+    "turns": 0,
+    "images": 0,
+    "failed": 0,
+    "seconds_total": 0.0,
+    "seconds_last": 0.0,
+    "seconds_max": 0.0,
+}
 
 
 router = APIRouter(prefix="/{chat_id}/messages", tags=["messages"])
@@ -57,33 +76,83 @@ async def _ensure_member(db: AsyncSession, chat_id: UUID, user_id: UUID) -> None
     if not is_member:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not a chat member")
 
+def _encode_cursor(m: MessageModel) -> str:
+    """Opaque keyset cursor for a message: base64url of its (created_at, id)."""
+    raw = json.dumps({"t": m.created_at.isoformat(), "id": str(m.id)})
+    return base64.urlsafe_b64encode(raw.encode("utf8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["t"]), UUID(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Malformed cursor")
+
+
+async def _resolve_cursor(db: AsyncSession, chat_id: UUID, value: str) -> Tuple[datetime, UUID]:
+    """Accept an opaque cursor, or (legacy) a plain message id as the anchor."""
+    try:
+        anchor_id = UUID(value)
+    except ValueError:
+        return _decode_cursor(value)
+
+    anchor_res = await db.execute(
+        select(MessageModel.created_at).where(MessageModel.id == anchor_id, MessageModel.chat_id == chat_id)
+    )
+    created_at = anchor_res.scalar_one_or_none()
+    if created_at is None:
+        raise HTTPException(status_code=404, detail="Anchor message not found")
+    return created_at, anchor_id
+
+
 @router.get("", response_model=List[MessageOut])
 async def list_messages(
     chat_id: UUID,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: UserOut = Depends(get_current_user),
     limit: int = Query(50, ge=1, le=200),
-    after: Optional[UUID] = Query(None, description="Return messages created after this message id"),
+    before: Optional[str] = Query(None, description="Cursor: return messages older than this one"),
+    after: Optional[str] = Query(None, description="Cursor (or message id): return messages newer than this one"),
 ) -> List[MessageOut]:
-    """List messages in a chat (newest first). Only for chat members."""
+    """
+    List messages in a chat (newest first). Only for chat members.
+
+    Keyset pagination over (created_at, id):
+    - X-Before-Cursor header -> pass as ?before= for the previous (older) page
+    - X-After-Cursor header  -> pass as ?after= for the next (newer) page
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+
     await _ensure_member(db, chat_id, current_user.id)
 
-    base = select(MessageModel).where(
+    # served by ix_messages_chat_created_id_live
+    q = select(MessageModel).where(
         MessageModel.chat_id == chat_id,
         MessageModel.is_deleted == False,  # safety: if soft-delete exists
     )
+    key = tuple_(MessageModel.created_at, MessageModel.id)
 
     if after:
-        anchor_res = await db.execute(select(MessageModel).where(MessageModel.id == after, MessageModel.chat_id == chat_id))
-        anchor = anchor_res.scalar_one_or_none()
-        if not anchor:
-            raise HTTPException(status_code=404, detail="Anchor message not found")
-        base = base.where(MessageModel.created_at > anchor.created_at)
-
-    q = base.order_by(desc(MessageModel.created_at)).limit(limit)
-    res = await db.execute(q)
+        q = q.where(key > await _resolve_cursor(db, chat_id, after))
+        q = q.order_by(MessageModel.created_at, MessageModel.id)
+    else:
+        if before:
+            q = q.where(key < await _resolve_cursor(db, chat_id, before))
+        q = q.order_by(desc(MessageModel.created_at), desc(MessageModel.id))
+
+    res = await db.execute(q.limit(limit))
+    items = list(res.scalars().all())
+    if after:
+        # fetched oldest-first to stay adjacent to the cursor
+        items.reverse()
 
-    items = res.scalars().all()
+    if items:
+        response.headers["X-After-Cursor"] = _encode_cursor(items[0])
+        response.headers["X-Before-Cursor"] = _encode_cursor(items[-1])
     return [MessageOut.model_validate(m) for m in items]
 
 async def gen_img2media_id(
@@ -98,10 +167,7 @@ async def gen_img2media_id(
     and returns the media_id (UUID).
     """
 
-    async with httpx.AsyncClient(base_url=NONCE_SERVICE_BASE, timeout=5.0, trust_env=False) as client:
-        resp = await client.post("/nonce")
-        resp.raise_for_status()
-        nonce = resp.json()["nonce"]
+    nonce = await acquire_nonce()
 
     now = int(time.time())
     claims = {
@@ -113,14 +179,10 @@ async def gen_img2media_id(
     }
     token = jwt.encode(claims, JWT_DEV_SECRET, algorithm=JWT_ALG)
 
-    try:
-        image_bytes = base64.b64decode(img.data)
-    except Exception as e:
-        raise RuntimeError(f"Failed to decode base64 image data: {e}") from e
-
     output_fmt = (img.output_format or "png").lower()
     files = {
-        "file": (f"{uuid.uuid4().hex}.{output_fmt}", image_bytes, f"image/{output_fmt}"),
+        # decoded bytes go straight into the multipart body
+        "file": (f"{uuid.uuid4().hex}.{output_fmt}", img.content, f"image/{output_fmt}"),
     }
     data = {
         "prompt": (prompt or getattr(img, "prompt", None) or ""),
@@ -130,67 +192,171 @@ async def gen_img2media_id(
         "X-Chat-Id": str(chat_id),
     }
 
-    async with httpx.AsyncClient(base_url=MEDIA_SERVICE_BASE, timeout=30.0, trust_env=False) as client:
-        resp = await client.post("/media", headers=headers, files=files, data=data)
-        if resp.is_error:
-            raise RuntimeError(f"Media upload failed: {resp.status_code} {resp.text}")
+    resp = await clients.get("media").post("/media", headers=headers, files=files, data=data)
+    if resp.is_error:
+        raise RuntimeError(f"Media upload failed: {resp.status_code} {resp.text}")
 
-        data = resp.json()
-        mid = data.get("id") or data.get("media_id")
-        if not mid:
-            raise RuntimeError(f"Malformed response: {data}")
+    data = resp.json()
+    mid = data.get("id") or data.get("media_id")
+    if not mid:
+        raise RuntimeError(f"Malformed response: {data}")
 
     return UUID(mid)
 
-async def generate_model_answer(
-    chat_id: UUID,
-    message: MessageCreate,
-    db: AsyncSession,
-) -> MessageOut:
-    """
-    Generate assistant reply with the domain Chat/Message,
-    upload generated images to Media service, persist assistant message,
-    and return it.
-    """
+async def _load_chat(db: AsyncSession, chat_id: UUID) -> ChatModel:
     res = await db.execute(select(ChatModel).where(ChatModel.id == chat_id))
     chat_model = res.scalar_one_or_none()
     if not chat_model:
         raise HTTPException(status_code=404, detail="Chat not found")
+    return chat_model
 
-    chat = Chat(chat_model.title, chat_model.previous_response_id)
+
+def _build_user_message(message: MessageCreate) -> Message:
     user_msg = Message(MessageRole.USER, message.text)
     for media_id in (message.media_ids or []):
         user_msg.attach_image(MediaImage(media_id))
+    return user_msg
 
-    response = await chat.send(user_msg)
 
-    gen_media_ids: List[UUID] = []
-    for gen_img in (getattr(response, "images", None) or []):
-        mid = await gen_img2media_id(gen_img, chat_id=chat_model.id)
-        gen_media_ids.append(mid)
+async def _upload_generated_images(chat_id: UUID, response: Message) -> List[UUID]:
+    """
+    Upload images generated by the model to Media service, at most
+    GEN_UPLOAD_CONCURRENCY at a time. Failed uploads are logged and skipped,
+    so the assistant text is persisted even if some images are lost.
+    """
+    images = getattr(response, "images", None) or []
+    if not images:
+        return []
 
-    assistant_msg = MessageModel(
-        chat_id=chat_id,
-        author_id=None,
-        role=MessageRole.ASSISTANT,
-        text=response.text,
+    sem = asyncio.Semaphore(GEN_UPLOAD_CONCURRENCY)
+
+    async def upload(img: GenImage) -> UUID:
+        async with sem:
+            return await gen_img2media_id(img, chat_id=chat_id)
+
+    started = time.monotonic()
+    results = await asyncio.gather(*(upload(img) for img in images), return_exceptions=True)
+    elapsed = time.monotonic() - started
+
+    gen_media_ids: List[UUID] = []
+    for img, res in zip(images, results):
+        if isinstance(res, BaseException):
+            logger.warning("Generated image upload failed for chat %s (%s): %r", chat_id, img, res)
+        else:
+            gen_media_ids.append(res)
+
+    failed = len(images) - len(gen_media_ids)
+    gen_upload_stats["turns"] += 1
+    gen_upload_stats["images"] += len(gen_media_ids)
+    gen_upload_stats["failed"] += failed
+    gen_upload_stats["seconds_total"] += elapsed
+    gen_upload_stats["seconds_last"] = elapsed
+    gen_upload_stats["seconds_max"] = max(gen_upload_stats["seconds_max"], elapsed)
+    logger.info(
+        "Uploaded %d/%d generated images for chat %s in %.3fs",
+        len(gen_media_ids), len(images), chat_id, elapsed,
     )
-    db.add(assistant_msg)
-    await db.flush()
+    return gen_media_ids
 
-    chat_model.previous_response_id = chat.previous_response_id
-    for mid in gen_media_ids:
-        db.add(MessageImage(message_id=assistant_msg.id, image_id=mid))
 
-    await db.commit()
-    await db.refresh(assistant_msg)
+async def _save_answer(
+    chat_id: UUID,
+    chat: Chat,
+    response: Message,
+    gen_media_ids: List[UUID],
+) -> MessageOut:
+    """
+    Persist assistant message, its images and chat.previous_response_id
+    in one short transaction, and return it.
+    """
+    async with SessionLocal() as db:
+        assistant_msg = MessageModel(
+            chat_id=chat_id,
+            author_id=None,
+            role=MessageRole.ASSISTANT,
+            text=response.text,
+        )
+        db.add(assistant_msg)
+        await db.flush()
+
+        await db.execute(
+            update(ChatModel)
+            .where(ChatModel.id == chat_id)
+            .values(previous_response_id=chat.previous_response_id)
+        )
+        for mid in gen_media_ids:
+            db.add(MessageImage(message_id=assistant_msg.id, image_id=mid))
+
+        await db.commit()
+        await db.refresh(assistant_msg)
+
+        return MessageOut.model_validate(assistant_msg)
+
+
+async def _complete_turn(chat: Chat, chat_id: UUID, message: MessageCreate) -> MessageOut:
+    """Run the LLM turn and persist the reply. Holds no DB connection while the model runs."""
+    response = await chat.send(_build_user_message(message))
+    gen_media_ids = await _upload_generated_images(chat_id, response)
+    return await _save_answer(chat_id, chat, response, gen_media_ids)
+
+
+async def generate_model_answer(
+    chat_id: UUID,
+    message: MessageCreate,
+) -> MessageOut:
+    """
+    Generate assistant reply with the domain Chat/Message,
+    upload generated images to Media service, persist assistant message,
+    and return it.
+
+    DB access is split into short transactions around the LLM call,
+    so a pooled connection is never held while waiting for the model.
+    """
+    async with SessionLocal() as db:
+        chat_model = await _load_chat(db, chat_id)
+
+    chat = Chat(chat_model.title, chat_model.previous_response_id)
+    return await _complete_turn(chat, chat_id, message)
+
+
+def _sse(event: str, data: str) -> str:
+    """Format a single Server-Sent Events frame."""
+    return f"event: {event}\ndata: {data}\n\n"
+
 
-    return MessageOut.model_validate(assistant_msg)
+async def stream_model_answer(chat: Chat, chat_id: UUID, message: MessageCreate) -> AsyncIterator[str]:
+    """
+    Same as generate_model_answer, but yields SSE frames while the model is generating:
+    - `delta`:   {"text": "..."} for every text chunk
+    - `image`:   {"status": "..."} for image generation progress
+    - `message`: the persisted MessageOut once the stream ends
+    - `error`:   {"detail": "..."} if the turn fails midway
+
+    Uses its own short DB session, since the request-scoped one is not
+    guaranteed to outlive the response.
+    """
+    try:
+        response: Optional[Message] = None
+        async for kind, value in chat.stream(_build_user_message(message)):
+            if kind is StreamEvent.DELTA:
+                yield _sse("delta", json.dumps({"text": value}))
+            elif kind is StreamEvent.IMAGE:
+                yield _sse("image", json.dumps({"status": value}))
+            elif kind is StreamEvent.DONE:
+                response = value
+
+        gen_media_ids = await _upload_generated_images(chat_id, response)
+        out = await _save_answer(chat_id, chat, response, gen_media_ids)
+        yield _sse("message", out.model_dump_json())
+    except Exception as e:
+        yield _sse("error", json.dumps({"detail": str(e) or e.__class__.__name__}))
 
 @router.post("/send", response_model=MessageOut, status_code=status.HTTP_201_CREATED)
 async def send_message(
     chat_id: UUID,
     payload: MessageCreate,
+    stream: bool = Query(False, description="Stream the assistant reply as Server-Sent Events"),
+    background: bool = Query(False, description="Queue the turn and return 202 with a turn id"),
     db: AsyncSession = Depends(get_db),
     current_user: UserOut = Depends(get_current_user),
 ):
@@ -200,9 +366,13 @@ async def send_message(
     - role is enforced by server: 'user'
     - text length is unrestricted
     - image/media attachments handled separately by Media service
+    - with ?stream=true the reply is returned as `text/event-stream`
+    - with ?background=true the turn is queued and 202 + TurnOut is returned;
+      poll GET /{chat_id}/turns/{turn_id} for the result
     """
     # Ensure current user is member of chat
     await _ensure_member(db, chat_id, current_user.id)
+    chat_model = await _load_chat(db, chat_id)
 
     msg = MessageModel(
         chat_id=chat_id,
@@ -216,9 +386,39 @@ async def send_message(
     for mid in payload.media_ids:
         db.add(MessageImage(message_id=msg.id, image_id=mid))
 
+    if background:
+        turn = Turn(chat_id=chat_id, author_id=current_user.id, message_id=msg.id)
+        db.add(turn)
+
+    # commit returns the pooled connection; nothing below holds one during the LLM call
     await db.commit()
 
-    return await generate_model_answer(chat_id, payload, db)
+    if background:
+        try:
+            await turn_pool.queue.put(turn.id)
+        except QueueFull:
+            turn.status = TurnStatus.FAILED
+            turn.error = "Turn queue is full"
+            await db.commit()
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Turn queue is full")
+        out = TurnOut(
+            id=turn.id,
+            chat_id=chat_id,
+            status=turn.status,
+            created_at=turn.created_at,
+            updated_at=turn.updated_at,
+        )
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=out.model_dump(mode="json"))
+
+    chat = Chat(chat_model.title, chat_model.previous_response_id)
+    if stream:
+        return StreamingResponse(
+            stream_model_answer(chat, chat_id, payload),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    return await _complete_turn(chat, chat_id, payload)
 
 @router.get("/{message_id}", response_model=MessageOut)
 async def get_message(
@@ -1,7 +1,7 @@
 import uuid
 from typing import List
 from datetime import datetime, timezone
-from sqlalchemy import String, Text, DateTime, ForeignKey, Boolean, Enum as SQLEnum
+from sqlalchemy import String, Text, DateTime, ForeignKey, Boolean, Index, text, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -12,6 +12,15 @@ from ..core.domain.mytypes import Role
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # keyset pagination of live messages: WHERE chat_id = ? ORDER BY created_at, id
+        Index(
+            "ix_messages_chat_created_id_live",
+            "chat_id", "created_at", "id",
+            postgresql_where=text("is_deleted = false"),
+            sqlite_where=text("is_deleted = 0"),
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -0,0 +1,132 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Optional, Tuple
+from ..signed_nonce import mint
+from .clients import clients
+
+logger = logging.getLogger(__name__)
+
+# service: fetch each nonce from nonce-service; signed: mint locally with NONCE_SIGNING_SECRET
+NONCE_MODE = os.getenv("NONCE_MODE", "service")
+NONCE_SIGNING_SECRET = os.getenv("NONCE_SIGNING_SECRET")
+NONCE_TTL = int(os.getenv("NONCE_TTL", "30"))  # seconds, signed mode
+
+# Prefetch pool (service mode); NONCE_POOL_SIZE=0 fetches one nonce per call
+NONCE_POOL_SIZE = int(os.getenv("NONCE_POOL_SIZE", "8"))
+NONCE_POOL_LOW_WATER = int(os.getenv("NONCE_POOL_LOW_WATER", str(NONCE_POOL_SIZE // 2)))
+# pooled nonces this close to expiry are discarded (leaves time for the upload and media's confirm)
+NONCE_POOL_MARGIN = float(os.getenv("NONCE_POOL_MARGIN", "5"))
+# must not exceed nonce-service's NONCE_BATCH_MAX, which caps POST /nonce/batch
+NONCE_BATCH_MAX = int(os.getenv("NONCE_BATCH_MAX", "64"))
+if NONCE_POOL_SIZE > NONCE_BATCH_MAX:
+    logger.warning("NONCE_POOL_SIZE=%d exceeds NONCE_BATCH_MAX=%d, using %d", NONCE_POOL_SIZE, NONCE_BATCH_MAX, NONCE_BATCH_MAX)
+    NONCE_POOL_SIZE = NONCE_BATCH_MAX
+
+
+class NoncePool:
+    """
+    Keeps up to `size` unexpired nonces from nonce-service in memory.
+    take() pops a fresh one; when the pool drops to `low_water` a refill
+    fetches a batch in the background. At most one fetch runs at a time:
+    background refills and callers that found the pool empty all wait on it.
+    Refills are driven by use, so an idle service lets the pool drain by
+    expiry instead of churning nonces.
+    """
+
+    def __init__(self, size: int, low_water: int, margin: float) -> None:
+        self.size = size
+        self.low_water = low_water
+        self.margin = margin
+        self._pool: Deque[Tuple[str, float]] = deque()  # (nonce, monotonic deadline)
+        self._fetching: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    async def _fetch(self, count: int) -> int:
+        """Add a batch to the pool; returns how many of them are usable."""
+        resp = await clients.get("nonce").post("/nonce/batch", params={"count": count})
+        resp.raise_for_status()
+        data = resp.json()
+        deadline = time.monotonic() + data["ttl"] - self.margin
+        if deadline <= time.monotonic():
+            return 0
+        self._pool.extend((n, deadline) for n in data["nonces"])
+        return len(data["nonces"])
+
+    def _start_fetch(self) -> asyncio.Task:
+        """The running fetch, or a new one topping the pool up to `size`."""
+        if self._fetching is None or self._fetching.done():
+            self._fetching = asyncio.create_task(self._fetch(max(1, self.size - len(self._pool))))
+            self._fetching.add_done_callback(self._fetch_done)
+        return self._fetching
+
+    @staticmethod
+    def _fetch_done(task: asyncio.Task) -> None:
+        # retrieved here so background failures are logged even if nobody awaits them
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Nonce pool refill failed", exc_info=task.exception())
+
+    def _pop_fresh(self) -> Optional[str]:
+        now = time.monotonic()
+        while self._pool:
+            nonce, deadline = self._pool.popleft()
+            if deadline > now:
+                return nonce
+            self.discarded += 1
+        return None
+
+    async def take(self) -> str:
+        nonce = self._pop_fresh()
+        if nonce is None:
+            # empty (cold start or drained by expiry): wait for the shared fetch;
+            # if concurrent callers took the whole batch, wait for the next one
+            self.misses += 1
+            while nonce is None:
+                added = await asyncio.shield(self._start_fetch())
+                nonce = self._pop_fresh()
+                if nonce is None and not added:
+                    raise RuntimeError("Nonce service returned no usable nonces")
+        else:
+            self.hits += 1
+        if len(self._pool) <= self.low_water:
+            self._start_fetch()
+        return nonce
+
+    async def close(self) -> None:
+        task, self._fetching = self._fetching, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._pool.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._pool),
+            "capacity": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "discarded": self.discarded,
+        }
+
+
+nonce_pool = NoncePool(NONCE_POOL_SIZE, NONCE_POOL_LOW_WATER, NONCE_POOL_MARGIN)
+
+
+async def acquire_nonce() -> str:
+    """Single-use nonce for a service JWT."""
+    if NONCE_MODE == "signed":
+        if not NONCE_SIGNING_SECRET:
+            raise RuntimeError("NONCE_MODE=signed requires NONCE_SIGNING_SECRET")
+        return mint(NONCE_SIGNING_SECRET, NONCE_TTL)
+
+    if NONCE_POOL_SIZE > 0:
+        return await nonce_pool.take()
+
+    resp = await clients.get("nonce").post("/nonce")
+    resp.raise_for_status()
+    return resp.json()["nonce"]
@@ -0,0 +1,25 @@
+import uuid
+from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
+from strenum import StrEnum
+from .message import MessageOut
+
+
+class TurnStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class TurnOut(BaseModel):
+    id: uuid.UUID
+    chat_id: uuid.UUID
+    status: TurnStatus
+    message: Optional[MessageOut] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,175 @@
+import os
+import asyncio
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+
+from .utils import get_current_user
+from .db.session import get_db, SessionLocal
+from ..schemas.users import UserOut
+from .models.turn import Turn
+from .models.message import Message as MessageModel
+from .schemas.message import MessageCreate, MessageOut
+from .schemas.turn import TurnOut, TurnStatus
+from .messages import _ensure_member, generate_model_answer
+from .worker import QueueFull, TurnQueue
+
+
+TURN_POLL_INTERVAL = float(os.getenv("TURN_POLL_INTERVAL", "0.5"))  # seconds
+TURN_WAIT_MAX = int(os.getenv("TURN_WAIT_MAX", "60"))               # seconds
+# RUNNING longer than this means the worker died mid-turn; QUEUED longer means the job was lost
+TURN_STALE_AFTER = float(os.getenv("TURN_STALE_AFTER", "900"))      # seconds
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = (TurnStatus.DONE, TurnStatus.FAILED)
+
+router = APIRouter(prefix="/{chat_id}/turns", tags=["turns"])
+
+
+async def execute_turn(turn_id: UUID) -> None:
+    """
+    Worker entrypoint: run the LLM turn for a queued user message and
+    record the result (or the error) on the Turn row.
+    Uses short sessions before and after the LLM call only.
+    """
+    async with SessionLocal() as db:
+        # claim the turn; another worker may have picked up a duplicate delivery
+        res = await db.execute(
+            update(Turn)
+            .where(Turn.id == turn_id, Turn.status == TurnStatus.QUEUED)
+            .values(status=TurnStatus.RUNNING)
+        )
+        await db.commit()
+        if res.rowcount != 1:
+            return
+
+        turn = await db.get(Turn, turn_id)
+        user_msg = await db.get(MessageModel, turn.message_id)
+        chat_id = turn.chat_id
+        payload = MessageCreate(text=user_msg.text, media_ids=user_msg.media_ids)
+
+    values = {"status": TurnStatus.DONE}
+    try:
+        out = await generate_model_answer(chat_id, payload)
+        values["result_message_id"] = out.id
+    except Exception as e:
+        values = {"status": TurnStatus.FAILED, "error": str(e) or e.__class__.__name__}
+
+    async with SessionLocal() as db:
+        # fail_stale_turns() may have reaped a slow turn meanwhile; its FAILED stands
+        res = await db.execute(
+            update(Turn).where(Turn.id == turn_id, Turn.status == TurnStatus.RUNNING).values(**values)
+        )
+        await db.commit()
+    if res.rowcount != 1:
+        logger.warning(
+            "Turn %s finished (%s, message %s) after it was marked failed; result not recorded",
+            turn_id, values["status"].value, values.get("result_message_id"),
+        )
+
+
+async def fail_stale_turns() -> int:
+    """Mark turns stuck in RUNNING for over TURN_STALE_AFTER as failed, so waiters see an outcome."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=TURN_STALE_AFTER)
+    async with SessionLocal() as db:
+        res = await db.execute(
+            update(Turn)
+            .where(Turn.status == TurnStatus.RUNNING, Turn.updated_at < cutoff)
+            .values(status=TurnStatus.FAILED, error="Interrupted: the worker stopped while running this turn")
+        )
+        await db.commit()
+    if res.rowcount:
+        logger.warning("Failed %d stale running turns", res.rowcount)
+    return res.rowcount
+
+
+async def recover_turns(queue: TurnQueue, requeue_all: bool) -> None:
+    """
+    Startup recovery. Fails stale RUNNING turns and re-enqueues QUEUED ones:
+    all of them when the queue is in-process (it did not survive the
+    restart), otherwise only those queued for over TURN_STALE_AFTER.
+    Duplicate deliveries are harmless, execute_turn() claims each turn once.
+    """
+    await fail_stale_turns()
+
+    q = select(Turn.id).where(Turn.status == TurnStatus.QUEUED)
+    if not requeue_all:
+        q = q.where(Turn.updated_at < datetime.now(timezone.utc) - timedelta(seconds=TURN_STALE_AFTER))
+    async with SessionLocal() as db:
+        turn_ids = (await db.execute(q.order_by(Turn.created_at))).scalars().all()
+
+    requeued = 0
+    for turn_id in turn_ids:
+        try:
+            await queue.put(turn_id)
+        except QueueFull:
+            logger.warning("Turn queue full, %d queued turns left for the next recovery", len(turn_ids) - requeued)
+            break
+        requeued += 1
+    if requeued:
+        logger.info("Re-enqueued %d queued turns", requeued)
+
+
+async def _turn_out(db: AsyncSession, chat_id: UUID, turn_id: UUID) -> TurnOut:
+    res = await db.execute(select(Turn).where(Turn.id == turn_id, Turn.chat_id == chat_id))
+    turn = res.scalar_one_or_none()
+    if not turn:
+        raise HTTPException(status_code=404, detail="Turn not found")
+
+    message: Optional[MessageOut] = None
+    if turn.result_message_id:
+        msg = await db.get(MessageModel, turn.result_message_id)
+        if msg:
+            message = MessageOut.model_validate(msg)
+
+    return TurnOut(
+        id=turn.id,
+        chat_id=turn.chat_id,
+        status=turn.status,
+        message=message,
+        error=turn.error,
+        created_at=turn.created_at,
+        updated_at=turn.updated_at,
+    )
+
+
+@router.get("/{turn_id}", response_model=TurnOut)
+async def get_turn(
+    chat_id: UUID,
+    turn_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user),
+) -> TurnOut:
+    """Get status of a turn started with POST /messages/send?background=true."""
+    await _ensure_member(db, chat_id, current_user.id)
+    return await _turn_out(db, chat_id, turn_id)
+
+
+@router.get("/{turn_id}/wait", response_model=TurnOut)
+async def wait_turn(
+    chat_id: UUID,
+    turn_id: UUID,
+    timeout: int = Query(30, ge=0, le=TURN_WAIT_MAX, description="Max seconds to wait for completion"),
+    current_user: UserOut = Depends(get_current_user),
+) -> TurnOut:
+    """
+    Long-poll: return as soon as the turn is done/failed or the timeout expires.
+    Each poll uses its own short session so waiting clients hold no DB connection.
+    """
+    async with SessionLocal() as db:
+        await _ensure_member(db, chat_id, current_user.id)
+
+    deadline = time.monotonic() + timeout
+    while True:
+        async with SessionLocal() as db:
+            out = await _turn_out(db, chat_id, turn_id)
+        if out.status in TERMINAL_STATUSES or time.monotonic() >= deadline:
+            return out
+        await asyncio.sleep(TURN_POLL_INTERVAL)
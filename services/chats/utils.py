@@ -1,26 +1,105 @@
 import os
+import time
+import hashlib
+from typing import Optional
+
+import jwt
 import httpx
 from fastapi import HTTPException, Request, status
 from ..schemas.users import UserOut
+from ..cache import TTLCache, Coalescer
+from ..jwt_keys import KeyRing
+from .clients import clients
+
+VERIFY_CACHE_SIZE = int(os.getenv("VERIFY_CACHE_SIZE", "10000"))
+VERIFY_CACHE_TTL = float(os.getenv("VERIFY_CACHE_TTL", "60"))         # seconds, capped by token exp
+VERIFY_NEGATIVE_TTL = float(os.getenv("VERIFY_NEGATIVE_TTL", "5"))    # seconds, for 401 responses
+
+# remote: ask users-service /users/me; local: verify access JWT with shared keys
+AUTH_VERIFY_MODE = os.getenv("AUTH_VERIFY_MODE", "remote")
+access_keys = KeyRing.from_env()
+
+# sha256(token) -> UserOut, or (status_code, detail) for a cached 401
+verification_cache = TTLCache(VERIFY_CACHE_SIZE)
+# concurrent cache misses for the same token share one users-service call
+verification_flights = Coalescer()
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf8")).hexdigest()
+
+
+def _token_ttl(token: str) -> float:
+    """Seconds a positive verification may be cached: never past the JWT `exp`."""
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.PyJWTError:
+        return 0.0
+    if exp is None:
+        return VERIFY_CACHE_TTL
+    return min(VERIFY_CACHE_TTL, float(exp) - time.time())
+
+
+def _user_from_claims(token: str) -> Optional[UserOut]:
+    """
+    Verify access JWT locally. Returns None for tokens issued without
+    profile claims, which still have to be resolved by users-service.
+    """
+    try:
+        claims = access_keys.decode_access(token)
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+    if "username" not in claims or "created_at" not in claims:
+        return None
+    try:
+        user = UserOut(
+            id=claims["sub"],
+            username=claims["username"],
+            is_active=claims.get("is_active", True),
+            created_at=claims["created_at"],
+        )
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
+    # same answer as users-service /users/me and /users/verify-access
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is inactive")
+    return user
 
-USERS_SERVICE_BASE = os.getenv("USERS_SERVICE_BASE", "http://users:8000")
-USERS_ME_URL = f"{USERS_SERVICE_BASE}/users/me"
-TIMEOUT = 5.0
 
 async def get_current_user(request: Request) -> UserOut:
     """
     1. Read Authorization: Bearer <token> from headers.
-    2. Forward it to users-service /users/me.
-    3. If token is valid, return user.
+    2. With AUTH_VERIFY_MODE=local, verify it in-process.
+       Otherwise return cached verification result if there is one.
+    3. Otherwise forward it to users-service /users/me.
+    4. If token is valid, return user.
        If not — raise HTTPException with same code.
     """
     auth = request.headers.get("Authorization")
     if not auth or not auth.lower().startswith("bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing Bearer token")
 
+    token = auth.split(" ", 1)[1].strip()
+    if AUTH_VERIFY_MODE == "local":
+        user = _user_from_claims(token)
+        if user is not None:
+            return user
+
+    key = _token_key(token)
+    cached = verification_cache.get(key)
+    if isinstance(cached, UserOut):
+        return cached
+    if cached is not None:
+        code, detail = cached
+        raise HTTPException(status_code=code, detail=detail)
+
+    return await verification_flights.run(key, lambda: _verify_remote(token, key))
+
+
+async def _verify_remote(token: str, key: str) -> UserOut:
+    """Resolve a token via users-service /users/me and cache the outcome."""
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-            r = await client.get(USERS_ME_URL, headers={"Authorization": auth})
+        r = await clients.get("users").get("/users/me", headers={"Authorization": f"Bearer {token}"})
     except httpx.RequestError:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Users service unavailable")
 
@@ -28,9 +107,11 @@ async def get_current_user(request: Request) -> UserOut:
         # propagate original auth error (401/403)
         if r.status_code in (400, 401, 403, 404):
             detail = r.json().get("detail", "Access denied") if "application/json" in r.headers.get("content-type", "") else "Access denied"
+            if r.status_code == status.HTTP_401_UNAUTHORIZED:
+                verification_cache.set(key, (r.status_code, detail), VERIFY_NEGATIVE_TTL)
             raise HTTPException(status_code=r.status_code, detail=detail)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Users verification failed")
 
-    return UserOut.model_validate(r.json())
-
-    
\ No newline at end of file
+    user = UserOut.model_validate(r.json())
+    verification_cache.set(key, user, _token_ttl(token))
+    return user
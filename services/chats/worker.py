@@ -0,0 +1,148 @@
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+from uuid import UUID
+
+TURN_WORKERS = int(os.getenv("TURN_WORKERS", "4"))
+TURN_QUEUE_BACKEND = os.getenv("TURN_QUEUE_BACKEND", "local")   # local | redis
+TURN_QUEUE_MAXSIZE = int(os.getenv("TURN_QUEUE_MAXSIZE", "1000"))
+TURN_QUEUE_KEY = os.getenv("TURN_QUEUE_KEY", "chats:turns")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the turn queue cannot accept more jobs."""
+
+
+class TurnQueue:
+    """Queue of turn ids waiting to be executed."""
+
+    async def put(self, turn_id: UUID) -> None:
+        raise NotImplementedError
+
+    async def get(self) -> UUID:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalTurnQueue(TurnQueue):
+    """In-process queue. Jobs are executed by the worker that accepted them."""
+
+    def __init__(self, maxsize: int) -> None:
+        self._queue: asyncio.Queue[UUID] = asyncio.Queue(maxsize=maxsize)
+
+    async def put(self, turn_id: UUID) -> None:
+        try:
+            self._queue.put_nowait(turn_id)
+        except asyncio.QueueFull:
+            raise QueueFull()
+
+    async def get(self) -> UUID:
+        return await self._queue.get()
+
+
+# bound check and push in one atomic step, so concurrent producers can't overshoot maxsize
+_BOUNDED_RPUSH = """
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('RPUSH', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+class RedisTurnQueue(TurnQueue):
+    """Redis list shared by every process/replica of the chats service."""
+
+    def __init__(self, url: str, key: str, maxsize: int) -> None:
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self._key = key
+        self._maxsize = maxsize
+        self._push = self._redis.register_script(_BOUNDED_RPUSH)
+
+    async def put(self, turn_id: UUID) -> None:
+        if not await self._push(keys=[self._key], args=[str(turn_id), self._maxsize]):
+            raise QueueFull()
+
+    async def get(self) -> UUID:
+        _, value = await self._redis.blpop([self._key])
+        return UUID(value)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def build_turn_queue() -> TurnQueue:
+    if TURN_QUEUE_BACKEND == "redis":
+        return RedisTurnQueue(REDIS_URL, TURN_QUEUE_KEY, TURN_QUEUE_MAXSIZE)
+    if TURN_QUEUE_BACKEND == "local":
+        return LocalTurnQueue(TURN_QUEUE_MAXSIZE)
+    raise ValueError(f"Unknown TURN_QUEUE_BACKEND: {TURN_QUEUE_BACKEND}")
+
+
+class TurnWorkerPool:
+    """
+    Fixed number of asyncio workers pulling turn ids from a TurnQueue,
+    plus an optional reaper called every `reap_interval` seconds.
+    """
+
+    def __init__(self, queue: TurnQueue, concurrency: int, reap_interval: float = 60.0) -> None:
+        self.queue = queue
+        self.concurrency = concurrency
+        self.reap_interval = reap_interval
+        self._tasks: List[asyncio.Task] = []
+
+    def start(
+        self,
+        handler: Callable[[UUID], Awaitable[None]],
+        reaper: Optional[Callable[[], Awaitable[object]]] = None,
+    ) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._work(handler), name=f"turn-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        if reaper is not None:
+            self._tasks.append(asyncio.create_task(self._reap(reaper), name="turn-reaper"))
+
+    async def _reap(self, reaper: Callable[[], Awaitable[object]]) -> None:
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                await reaper()
+            except Exception:
+                logger.exception("Turn reaper failed")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.queue.close()
+
+    async def _work(self, handler: Callable[[UUID], Awaitable[None]]) -> None:
+        while True:
+            turn_id: Optional[UUID] = None
+            try:
+                turn_id = await self.queue.get()
+                await handler(turn_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Turn %s failed in worker", turn_id)
+                if turn_id is None:
+                    # queue backend is unhealthy; don't spin
+                    await asyncio.sleep(1.0)
+
+
+TURN_REAP_INTERVAL = float(os.getenv("TURN_REAP_INTERVAL", "60"))  # seconds between stale-turn sweeps
+
+turn_pool = TurnWorkerPool(build_turn_queue(), TURN_WORKERS, TURN_REAP_INTERVAL)
@@ -0,0 +1,98 @@
+import os
+import logging
+import importlib.util
+from typing import Dict, Optional
+
+import httpx
+
+# Defaults for every upstream; can be overridden per upstream in register()
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # seconds
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "0") == "1"                   # needs `pip install httpx[http2]`
+
+logger = logging.getLogger(__name__)
+
+
+class Upstream:
+    """Connection settings for one upstream service."""
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float,
+        max_connections: int,
+        max_keepalive: int,
+        trust_env: bool,
+        http2: bool,
+    ) -> None:
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.trust_env = trust_env
+        self.http2 = http2
+
+
+class ClientRegistry:
+    """
+    Long-lived, keep-alive httpx clients, one per upstream service.
+    Create with register(), open in app startup with start(), close in shutdown with aclose().
+    get() opens a client lazily, so code running outside the app (CLI, scripts) works too.
+    """
+
+    def __init__(self) -> None:
+        self._upstreams: Dict[str, Upstream] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def register(
+        self,
+        name: str,
+        base_url: str,
+        timeout: float = 5.0,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        trust_env: bool = True,
+        http2: Optional[bool] = None,
+    ) -> None:
+        self._upstreams[name] = Upstream(
+            base_url=base_url,
+            timeout=timeout,
+            max_connections=max_connections,
+            max_keepalive=max_keepalive,
+            trust_env=trust_env,
+            http2=HTTP2_ENABLED if http2 is None else http2,
+        )
+
+    def _open(self, name: str) -> httpx.AsyncClient:
+        up = self._upstreams[name]
+        http2 = up.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested for '%s' but 'h2' is not installed, using HTTP/1.1", name)
+            http2 = False
+        return httpx.AsyncClient(
+            base_url=up.base_url,
+            timeout=up.timeout,
+            trust_env=up.trust_env,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=up.max_connections,
+                max_keepalive_connections=up.max_keepalive,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._open(name)
+        return client
+
+    def start(self) -> None:
+        for name in self._upstreams:
+            self.get(name)
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
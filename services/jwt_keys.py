@@ -0,0 +1,72 @@
+import os
+import json
+from typing import Any, Dict, Optional
+
+import jwt
+
+
+class KeyRing:
+    """
+    Key material for access JWTs shared between services.
+
+    Tokens are signed with the active key and carry its id in the `kid` header.
+    Verification picks the key by `kid`, so old keys stay valid until they are
+    removed from the ring. Tokens without `kid` are checked against the default key.
+    """
+
+    def __init__(
+        self,
+        default_key: str,
+        algorithm: str = "HS256",
+        keys: Optional[Dict[str, str]] = None,
+        active_kid: Optional[str] = None,
+    ) -> None:
+        self.default_key = default_key
+        self.algorithm = algorithm
+        self.keys: Dict[str, str] = keys or {}
+        self.active_kid = active_kid
+        if active_kid and active_kid not in self.keys:
+            raise ValueError(f"Active kid '{active_kid}' is not in the key ring")
+
+    @classmethod
+    def from_env(cls) -> "KeyRing":
+        """
+        JWT_SECRET       - default key (tokens without kid)
+        JWT_ALG          - algorithm, HS256 by default
+        JWT_KEYS         - JSON object {"<kid>": "<secret>", ...}
+        JWT_ACTIVE_KID   - kid used for signing new tokens
+        """
+        return cls(
+            default_key=os.getenv("JWT_SECRET", "jwt-secret"),
+            algorithm=os.getenv("JWT_ALG", "HS256"),
+            keys=json.loads(os.getenv("JWT_KEYS", "{}")),
+            active_kid=os.getenv("JWT_ACTIVE_KID") or None,
+        )
+
+    def encode(self, payload: Dict[str, Any]) -> str:
+        if self.active_kid:
+            return jwt.encode(
+                payload, self.keys[self.active_kid], algorithm=self.algorithm,
+                headers={"kid": self.active_kid},
+            )
+        return jwt.encode(payload, self.default_key, algorithm=self.algorithm)
+
+    def _key_for(self, token: str) -> str:
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            return self.default_key
+        key = self.keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown key id '{kid}'")
+        return key
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        """Verify signature and exp. Raises jwt.PyJWTError on failure."""
+        return jwt.decode(token, self._key_for(token), algorithms=[self.algorithm])
+
+    def decode_access(self, token: str) -> Dict[str, Any]:
+        """Same as decode(), and require typ='access'."""
+        claims = self.decode(token)
+        if claims.get("typ") != "access":
+            raise jwt.InvalidTokenError("Wrong token type")
+        return claims
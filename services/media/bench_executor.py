@@ -0,0 +1,95 @@
+"""
+Event-loop stall caused by large uploads: hashing on the event loop (old
+behaviour) vs in cpu_pool.
+
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m services.media.bench_executor [uploads] [mib_each]
+
+Concurrent uploads do the CPU work of POST /media: either the old
+whole-body sniff and sha256 on the loop, or the current per-chunk
+_UploadDigest.update and _get_image_size in cpu_pool. Meanwhile a probe
+runs a ~1ms request every 5ms, standing in for GET /media/{id} on the same
+worker, and its latency percentiles are reported. DATABASE_URL is only
+needed to import the service; nothing touches the database or storage.
+"""
+import os
+import sys
+import time
+import asyncio
+import hashlib
+from io import BytesIO
+from typing import List
+
+from PIL import Image
+
+from .media import UPLOAD_CHUNK_BYTES, _UploadDigest, _get_image_size, cpu_pool
+
+PROBE_INTERVAL = 0.005
+PROBE_WORK = 0.001
+
+
+def _pct(samples: List[float], p: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * p))] * 1000 if s else 0.0
+
+
+def _payload(mib: int) -> bytes:
+    buf = BytesIO()
+    Image.new("RGB", (64, 64)).save(buf, format="PNG")
+    head = buf.getvalue()
+    return head + os.urandom(mib * 1024 * 1024 - len(head))
+
+
+async def _upload_inline(content: bytes) -> None:
+    """Old POST /media: whole body read, sniffed and hashed on the event loop."""
+    await asyncio.sleep(0)
+    _get_image_size(content)
+    hashlib.sha256(content).hexdigest()
+
+
+async def _upload_offloaded(content: bytes) -> None:
+    """Current POST /media: per-chunk hashing and the header sniff in cpu_pool."""
+    digest = _UploadDigest()
+    for i in range(0, len(content), UPLOAD_CHUNK_BYTES):
+        await cpu_pool.run(digest.update, content[i:i + UPLOAD_CHUNK_BYTES])
+    await cpu_pool.run(_get_image_size, bytes(digest.header))
+    digest.sha256.hexdigest()
+
+
+async def _probe(stop: asyncio.Event, latencies: List[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_WORK)
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(PROBE_INTERVAL)
+
+
+async def _run(content: bytes, uploads: int, offload: bool) -> None:
+    stop = asyncio.Event()
+    latencies: List[float] = []
+    probe = asyncio.create_task(_probe(stop, latencies))
+    await asyncio.sleep(0.1)
+    start = time.perf_counter()
+    upload = _upload_offloaded if offload else _upload_inline
+    await asyncio.gather(*(upload(content) for _ in range(uploads)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    mib = uploads * len(content) / (1024 * 1024)
+    name = "cpu_pool" if offload else "event loop"
+    print(f"{name:>10}: {mib / elapsed:>7.0f} MiB/s  probe p50={_pct(latencies, .5):.1f}ms "
+          f"p99={_pct(latencies, .99):.1f}ms max={_pct(latencies, 1):.1f}ms (n={len(latencies)})")
+
+
+async def main() -> None:
+    uploads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    mib = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    content = _payload(mib)
+    print(f"uploads={uploads} x {mib} MiB, chunk={UPLOAD_CHUNK_BYTES} bytes, workers={cpu_pool.max_workers}")
+    await _run(content, uploads, offload=False)
+    await _run(content, uploads, offload=True)
+    print(f"cpu_pool: {cpu_pool.stats()}")
+    cpu_pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
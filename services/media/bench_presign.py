@@ -0,0 +1,70 @@
+"""
+Presign throughput: a new S3 session/client per request (old behaviour)
+vs the shared client vs the shared client plus presign_cache.
+
+    S3_ENDPOINT=http://localhost:9000 S3_ACCESS_KEY=minio S3_SECRET_KEY=minio123 \\
+        python -m services.media.bench_presign 2000
+
+Presigning is a local signature computation, so any S3 stand-in
+(MinIO, moto_server) or even an unreachable endpoint gives the same numbers;
+what is measured is client construction and signing.
+"""
+import sys
+import time
+import asyncio
+
+import aioboto3
+
+from .storage import (
+    S3_ENDPOINT, S3_BUCKET, S3_ACCESS_KEY, S3_SECRET_KEY,
+    PRESIGN_EXPIRES, PRESIGN_CACHE_TTL, S3Storage, presign_cache,
+)
+
+s3_storage = S3Storage()
+KEYS = [f"blobs/{i:02x}/bench-{i}" for i in range(256)]
+
+
+async def _sign(s3, key: str) -> str:
+    return await s3.generate_presigned_url(
+        "get_object", Params={"Bucket": S3_BUCKET, "Key": key}, ExpiresIn=PRESIGN_EXPIRES,
+    )
+
+
+async def per_request(n: int) -> None:
+    for i in range(n):
+        async with aioboto3.Session().client(
+            "s3", endpoint_url=S3_ENDPOINT,
+            aws_access_key_id=S3_ACCESS_KEY, aws_secret_access_key=S3_SECRET_KEY,
+        ) as s3:
+            await _sign(s3, KEYS[i % len(KEYS)])
+
+
+async def shared(n: int) -> None:
+    for i in range(n):
+        await s3_storage.presign(KEYS[i % len(KEYS)])
+
+
+async def shared_cached(n: int) -> None:
+    for i in range(n):
+        key = KEYS[i % len(KEYS)]
+        if presign_cache.get((key, None)) is None:
+            presign_cache.set((key, None), await s3_storage.presign(key), PRESIGN_CACHE_TTL)
+
+
+async def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"endpoint={S3_ENDPOINT} presigns={n} distinct keys={len(KEYS)}")
+    for name, fn, count in (
+        ("per-request client", per_request, max(1, n // 10)),
+        ("shared client", shared, n),
+        ("shared client + cache", shared_cached, n),
+    ):
+        start = time.perf_counter()
+        await fn(count)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>22}: {count / elapsed:>10.0f} presigns/s")
+    await s3_storage.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
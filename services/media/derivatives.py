@@ -0,0 +1,151 @@
+import os
+import asyncio
+import logging
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+from fastapi import HTTPException
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models.image import Image as ImageModel
+from .models.image_variant import ImageVariant
+from ..executors import BoundedExecutor
+from .storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# name -> (max long side in px, output format)
+VARIANTS: Dict[str, Tuple[int, str]] = {
+    "llm": (1024, "WEBP"),
+    "hd": (2048, "WEBP"),
+}
+VARIANT_QUALITY = int(os.getenv("MEDIA_VARIANT_QUALITY", "85"))
+
+# Decoding and resizing hold the GIL, so they get their own process pool
+MEDIA_IMAGE_WORKERS = int(os.getenv("MEDIA_IMAGE_WORKERS", str(os.cpu_count() or 1)))
+image_pool = BoundedExecutor("media-image", MEDIA_IMAGE_WORKERS, kind="process")
+
+# (source_key, variant) -> in-progress generation, so concurrent first requests share one;
+# resolves to None if it failed
+_inflight: Dict[Tuple[str, str], "asyncio.Future[Optional[str]]"] = {}
+
+
+class VariantUnavailable(Exception):
+    """The requested variant could not be generated (e.g. the original does not decode)."""
+
+
+def validate_variant(variant: Optional[str]) -> None:
+    if variant is not None and variant not in VARIANTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown variant '{variant}', expected one of: {', '.join(VARIANTS)}",
+        )
+
+
+def render_variant(data: bytes, max_side: int, fmt: str) -> Tuple[bytes, int, int]:
+    """Downscale an image so its long side is <= max_side. Blocking: run in image_pool."""
+    with Image.open(BytesIO(data)) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "transparency" in im.info or "A" in im.getbands() else "RGB")
+        im.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        out = BytesIO()
+        im.save(out, format=fmt, quality=VARIANT_QUALITY)
+        return out.getvalue(), im.width, im.height
+
+
+def _variant_key(source_key: str, variant: str, fmt: str) -> str:
+    return f"{source_key}.{variant}.{fmt.lower()}"
+
+
+def variant_mime(variant: str) -> str:
+    return f"image/{VARIANTS[variant][1].lower()}"
+
+
+async def _generate(db: AsyncSession, storage: StorageBackend, source_key: str, variant: str) -> str:
+    max_side, fmt = VARIANTS[variant]
+    data = await storage.read(source_key)
+
+    out, w, h = await image_pool.run(render_variant, data, max_side, fmt)
+    key = _variant_key(source_key, variant, fmt)
+    mime = variant_mime(variant)
+    await storage.put(key, out, mime)
+
+    try:
+        # savepoint: a failure must not expire the caller's loaded rows
+        async with db.begin_nested():
+            db.add(ImageVariant(
+                source_key=source_key, variant=variant, storage_key=key,
+                mime_type=mime, width=w, height=h, size_bytes=len(out),
+            ))
+    except IntegrityError:
+        # generated concurrently by another worker; the object is the same
+        pass
+    await db.commit()
+    return key
+
+
+async def variant_key(
+    db: AsyncSession, storage: StorageBackend, img: ImageModel, variant: Optional[str]
+) -> str:
+    """
+    Storage key to serve for an image and requested variant.
+    Variants are generated lazily on first request and cached in storage.
+    The original is returned when no variant is requested or it is already
+    small enough; VariantUnavailable is raised if generation fails, so the
+    caller does not present the original as the variant.
+    """
+    if variant is None:
+        return img.storage_url
+    max_side, _ = VARIANTS[variant]
+    if img.width and img.height and max(img.width, img.height) <= max_side:
+        return img.storage_url
+
+    res = await db.execute(
+        select(ImageVariant.storage_key).where(
+            ImageVariant.source_key == img.storage_url, ImageVariant.variant == variant
+        )
+    )
+    key = res.scalar_one_or_none()
+    if key:
+        return key
+
+    slot = (img.storage_url, variant)
+    fut = _inflight.get(slot)
+    if fut is None:
+        fut = _inflight[slot] = asyncio.get_running_loop().create_future()
+        try:
+            key = await _generate(db, storage, img.storage_url, variant)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception:
+            logger.exception("Generating variant %s of %s failed", variant, img.storage_url)
+            key = None
+        finally:
+            _inflight.pop(slot, None)
+        fut.set_result(key)
+    else:
+        key = await asyncio.shield(fut)
+    if key is None:
+        raise VariantUnavailable(variant)
+    return key
+
+
+async def drop_variants(db: AsyncSession, source_key: str) -> List[str]:
+    """
+    Delete the variant rows of an object in the caller's transaction and
+    return their keys; the caller deletes the objects after commit.
+    """
+    res = await db.execute(
+        delete(ImageVariant).where(ImageVariant.source_key == source_key).returning(ImageVariant.storage_key)
+    )
+    return list(res.scalars().all())
+
+
+def variant_keys(source_key: str) -> List[str]:
+    """Every key a variant of this object can be stored under."""
+    return [_variant_key(source_key, name, fmt) for name, (_, fmt) in VARIANTS.items()]
@@ -0,0 +1,233 @@
+import os
+import time
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+import uuid
+
+from sqlalchemy import select, update, delete, table, column
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from .db.session import DATABASE_URL, SessionLocal, engine
+from .models.image import Image as ImageModel
+from .models.blob import Blob
+from .models.image_variant import ImageVariant
+from .storage import StorageDeleteError, storage
+from .derivatives import variant_keys
+from .media import _forget_image, _forget_urls
+
+logger = logging.getLogger(__name__)
+
+MEDIA_GC_ENABLED = os.getenv("MEDIA_GC_ENABLED", "0") == "1"
+MEDIA_GC_INTERVAL = float(os.getenv("MEDIA_GC_INTERVAL", "3600"))      # seconds between runs
+MEDIA_GC_GRACE = float(os.getenv("MEDIA_GC_GRACE", str(24 * 3600)))    # seconds, min age of collected images
+MEDIA_GC_BATCH = int(os.getenv("MEDIA_GC_BATCH", "500"))               # images per transaction
+MEDIA_GC_DRY_RUN = os.getenv("MEDIA_GC_DRY_RUN", "0") == "1"
+# message_images lives in the chats database (the same one by default)
+CHATS_DATABASE_URL = os.getenv("CHATS_DATABASE_URL") or DATABASE_URL
+
+message_images = table("message_images", column("image_id", UUID(as_uuid=True)))
+
+
+class MediaGC:
+    """
+    Background garbage collection of images, every `interval` seconds:
+    - soft-deleted images whose deleted_at is older than `grace` are hard-deleted
+    - live images older than `grace` that no message references (orphans:
+      uploaded but never attached) are deleted, releasing their blobs
+    Images are scanned in keyset-paginated batches of `batch_size`, one
+    transaction per batch; rows are locked with SKIP LOCKED so several
+    workers can run it at once. With dry_run nothing is changed, the
+    counters then report what would have been deleted.
+    """
+
+    def __init__(self, interval: float, grace: float, batch_size: int, dry_run: bool) -> None:
+        self.interval = interval
+        self.grace = grace
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self._task: Optional[asyncio.Task] = None
+        self._chats_engine: Optional[AsyncEngine] = None
+
+        self.runs = 0
+        self.errors = 0
+        self.last_run: Dict[str, Any] = {}
+        self.totals: Counter = Counter()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="media-gc")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._chats_engine is not None and self._chats_engine is not engine:
+            await self._chats_engine.dispose()
+        self._chats_engine = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                self.errors += 1
+                logger.exception("Media GC run failed")
+
+    async def run_once(self) -> Dict[str, Any]:
+        started = time.monotonic()
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.grace)
+        progress: Counter = Counter()
+        self.last_run = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "dry_run": self.dry_run,
+            "progress": progress,
+        }
+
+        await self._sweep(
+            progress, "purged",
+            (ImageModel.is_deleted == True, ImageModel.deleted_at < cutoff),
+            self._purge_batch,
+        )
+        await self._sweep(
+            progress, "orphans",
+            (ImageModel.is_deleted == False, ImageModel.created_at < cutoff),
+            self._orphan_batch,
+        )
+
+        self.runs += 1
+        self.totals.update(progress)
+        self.last_run["duration_s"] = round(time.monotonic() - started, 3)
+        logger.info("Media GC%s: %s", " (dry run)" if self.dry_run else "", dict(progress))
+        return self.last_run
+
+    async def _sweep(self, progress: Counter, name: str, where: tuple, handle) -> None:
+        """Walk matching images by id (keyset), one transaction per batch."""
+        after: Optional[uuid.UUID] = None
+        while True:
+            async with SessionLocal() as db:
+                q = select(ImageModel).where(*where)
+                if after is not None:
+                    q = q.where(ImageModel.id > after)
+                q = q.order_by(ImageModel.id).limit(self.batch_size)
+                if not self.dry_run:
+                    q = q.with_for_update(skip_locked=True)
+                images = (await db.execute(q)).scalars().all()
+                if not images:
+                    return
+                after = images[-1].id
+                progress[f"{name}_scanned"] += len(images)
+
+                collected = await handle(db, images)
+                progress[name] += len(collected)
+                if self.dry_run or not collected:
+                    await db.rollback()
+                    continue
+
+                try:
+                    keys = await self._delete_images(db, collected)
+                except StorageDeleteError as e:
+                    # keep this batch for the next run, go on with the rest
+                    await db.rollback()
+                    progress["delete_failed"] += len(e.keys)
+                    logger.warning("Media GC: %s, batch of %d %s kept: %s", e, len(collected), name, e.keys)
+                    continue
+                await db.commit()
+                progress["objects_deleted"] += len(keys)
+                for img in collected:
+                    _forget_image(img.id)
+                for key in keys:
+                    _forget_urls(key)
+
+    async def _purge_batch(self, db: AsyncSession, images: List[ImageModel]) -> List[ImageModel]:
+        # blobs were already released by DELETE /media/{id}; _delete_images
+        # repeats its object deletion in case that failed
+        return images
+
+    async def _orphan_batch(self, db: AsyncSession, images: List[ImageModel]) -> List[ImageModel]:
+        referenced = await self._referenced(img.id for img in images)
+        return [img for img in images if img.id not in referenced]
+
+    async def _referenced(self, ids: Iterable[uuid.UUID]) -> Set[uuid.UUID]:
+        """Ids attached to at least one message (chats database)."""
+        if self._chats_engine is None:
+            self._chats_engine = engine if CHATS_DATABASE_URL == DATABASE_URL else create_async_engine(CHATS_DATABASE_URL)
+        async with self._chats_engine.connect() as conn:
+            res = await conn.execute(
+                select(message_images.c.image_id).where(message_images.c.image_id.in_(list(ids))).distinct()
+            )
+            return set(res.scalars().all())
+
+    async def _delete_images(self, db: AsyncSession, images: List[ImageModel]) -> List[str]:
+        """
+        Hard-delete image rows, dropping storage objects no longer referenced.
+        Objects are deleted before the caller commits; if that fails
+        (StorageDeleteError) the caller rolls the batch back, so it is retried
+        on the next run. Returns the deleted keys.
+        """
+        keys: List[str] = []
+        # live (orphaned) images still hold a blob reference; soft-deleted ones released it
+        releases = Counter(img.blob_sha256 for img in images if img.blob_sha256 and not img.is_deleted)
+        for sha, n in releases.items():
+            await db.execute(update(Blob).where(Blob.sha256 == sha).values(ref_count=Blob.ref_count - n))
+        if releases:
+            res = await db.execute(
+                delete(Blob).where(Blob.sha256.in_(list(releases)), Blob.ref_count <= 0).returning(Blob.storage_key)
+            )
+            keys.extend(res.scalars().all())
+        # DELETE /media/{id} removes objects after its commit; repeat it for
+        # soft-deleted images in case that failed. Deleting a missing object is
+        # a no-op, and neither kind of key below is ever written again:
+        # - legacy per-image objects are never shared
+        garbage = [img.storage_url for img in images if not img.blob_sha256]
+        # - blob keys are unique per blob, so one without a blob row is garbage
+        released = {img.storage_url for img in images if img.is_deleted and img.blob_sha256}
+        if released:
+            res = await db.execute(select(Blob.storage_key).where(Blob.storage_key.in_(released)))
+            garbage.extend(released - set(res.scalars().all()))
+        for key in garbage:
+            keys.append(key)
+            keys.extend(variant_keys(key))
+
+        if keys:
+            res = await db.execute(
+                delete(ImageVariant).where(ImageVariant.source_key.in_(keys)).returning(ImageVariant.storage_key)
+            )
+            keys.extend(res.scalars().all())
+            keys = list(dict.fromkeys(keys))
+            await storage.delete(keys)
+
+        await db.execute(delete(ImageModel).where(ImageModel.id.in_([img.id for img in images])))
+        return keys
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "dry_run": self.dry_run,
+            "interval_s": self.interval,
+            "grace_s": self.grace,
+            "runs": self.runs,
+            "errors": self.errors,
+            "totals": dict(self.totals),
+            "last_run": {**self.last_run, "progress": dict(self.last_run.get("progress", {}))},
+        }
+
+
+media_gc = MediaGC(MEDIA_GC_INTERVAL, MEDIA_GC_GRACE, MEDIA_GC_BATCH, MEDIA_GC_DRY_RUN)
+
+
+if __name__ == "__main__":
+    # one-off run: python -m services.media.gc
+    async def _main() -> None:
+        try:
+            print(await media_gc.run_once())
+        finally:
+            await media_gc.stop()
+            await storage.aclose()
+
+    asyncio.run(_main())
@@ -1,8 +1,13 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from .media import router
+from .media import router, cpu_pool, meta_cache
+from .derivatives import image_pool
 from .db.session import init_db
+from .clients import clients
+from .storage import storage, presign_cache
+from .gc import media_gc, MEDIA_GC_ENABLED
+from .security import verification_flights
 from fastapi import FastAPI
 
 app = FastAPI(title="Media Service")
@@ -10,6 +15,29 @@ app = FastAPI(title="Media Service")
 @app.on_event("startup")
 async def on_startup() -> None:
     await init_db()
+    clients.start()
+    await storage.start()
+    if MEDIA_GC_ENABLED:
+        media_gc.start()
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await media_gc.stop()
+    await clients.aclose()
+    await storage.aclose()
+    cpu_pool.shutdown()
+    image_pool.shutdown()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> dict:
+    return {
+        "cpu_pool": cpu_pool.stats(),
+        "image_pool": image_pool.stats(),
+        "presign_cache": presign_cache.stats(),
+        "meta_cache": meta_cache.stats(),
+        "gc": media_gc.stats(),
+        "verification_flights": verification_flights.stats(),
+    }
 
 app.include_router(router, prefix="/v1/media")
 
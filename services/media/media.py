@@ -2,50 +2,70 @@
 import os
 import uuid
 import hashlib
+import logging
+import secrets
 from io import BytesIO
-from typing import Optional
+from datetime import datetime, timezone
+from typing import List, Optional
 
-import aioboto3
 from PIL import Image
 from fastapi import (
     APIRouter, Depends, UploadFile, File,
-    HTTPException, status, Header, Form
+    HTTPException, status, Header, Form, Query, Request
 )
+from fastapi.responses import FileResponse, RedirectResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
 
 from .db.session import get_db
 from .models.image import Image as ImageModel
+from .models.blob import Blob
+from ..executors import BoundedExecutor
+from ..cache import TTLCache
+from .derivatives import VARIANTS, VariantUnavailable, variant_key, variant_mime, drop_variants, validate_variant
+from .storage import UPLOAD_CHUNK_BYTES, PRESIGN_CACHE_TTL, storage, presign_cache
 from ..schemas.media import ImageKind  
 from .media_enums import PrincipalMode
-from ..schemas.media import MediaOut
+from ..schemas.media import MediaOut, MediaUrl, MediaUrls, MediaIdsIn
 from .security import (
     get_principal, require_user, require_service,
     Principal
 )
 
 router = APIRouter(tags=["media"])
+logger = logging.getLogger(__name__)
 
-# S3 config (bucket must already exist)
-S3_ENDPOINT = os.getenv("S3_ENDPOINT", "https://storage.clo.ru")
-S3_BUCKET = os.getenv("S3_BUCKET", "llm-chat-images")
-S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY")
-S3_SECRET_KEY = os.getenv("S3_SECRET_KEY")
-PRESIGN_EXPIRES = int(os.getenv("S3_PRESIGN_TTL", "900"))  # seconds
-
-
-def _s3_client():
-    """Create aioboto3 S3 client (bucket must already exist)."""
-    return aioboto3.Session().client(
-        "s3",
-        endpoint_url=S3_ENDPOINT,
-        aws_access_key_id=S3_ACCESS_KEY,
-        aws_secret_access_key=S3_SECRET_KEY,
-    )
+MEDIA_BATCH_MAX_IDS = int(os.getenv("MEDIA_BATCH_MAX_IDS", "100"))
+
+# Base of URLs handed out for backends without direct URLs (MEDIA_STORAGE=local)
+MEDIA_PUBLIC_BASE = os.getenv("MEDIA_PUBLIC_BASE", "http://localhost:8003/v1").rstrip("/")
+
+# HTTP caching. Metadata of an id never changes (only soft deletion), content is
+# content-addressed; presigned URLs expire, so /url responses are short-lived
+MEDIA_META_MAX_AGE = int(os.getenv("MEDIA_META_MAX_AGE", "300"))          # seconds
+MEDIA_CONTENT_MAX_AGE = int(os.getenv("MEDIA_CONTENT_MAX_AGE", "86400"))  # seconds
+MEDIA_URL_MAX_AGE = int(os.getenv("MEDIA_URL_MAX_AGE", "60"))             # seconds, < PRESIGN_CACHE_TTL
+# The original served in place of a variant that failed to render; retried once this expires
+MEDIA_FALLBACK_MAX_AGE = int(os.getenv("MEDIA_FALLBACK_MAX_AGE", "60"))    # seconds
+# In-process cache of Image rows by id; a delete in another worker is seen after at most the TTL
+MEDIA_META_CACHE_SIZE = int(os.getenv("MEDIA_META_CACHE_SIZE", "10000"))
+MEDIA_META_CACHE_TTL = float(os.getenv("MEDIA_META_CACHE_TTL", "60"))
+meta_cache = TTLCache(MEDIA_META_CACHE_SIZE)
+# Bumped by every _forget_image(); a load that spans one does not cache its row
+_meta_generation = 0
+
+# Upload limits
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+HEADER_SNIFF_BYTES = 64 * 1024                                                    # enough for image dimensions
 
+# Image inspection and hashing run here, off the event loop
+MEDIA_CPU_WORKERS = int(os.getenv("MEDIA_CPU_WORKERS", str(min(8, (os.cpu_count() or 1) + 2))))
+cpu_pool = BoundedExecutor("media-cpu", MEDIA_CPU_WORKERS)
 
-async def _get_image_size(content: bytes) -> tuple[Optional[int], Optional[int]]:
-    """Best-effort detect width and height for an image."""
+
+def _get_image_size(content: bytes) -> tuple[Optional[int], Optional[int]]:
+    """Best-effort detect width and height for an image. Blocking: run in cpu_pool."""
     try:
         with Image.open(BytesIO(content)) as im:
             return im.width, im.height
@@ -53,12 +73,178 @@ async def _get_image_size(content: bytes) -> tuple[Optional[int], Optional[int]]
         return None, None
 
 
-def _make_key(chat_id: str, media_id: uuid.UUID, filename: str | None) -> str:
-    """Build S3 object key."""
-    ext = ""
-    if filename and "." in filename:
-        ext = "." + filename.rsplit(".", 1)[1].lower()
-    return f"chats/{chat_id}/{media_id}{ext}"
+def _content_url(media_id: uuid.UUID, variant: Optional[str]) -> str:
+    url = f"{MEDIA_PUBLIC_BASE}/media/{media_id}/content"
+    return f"{url}?variant={variant}" if variant else url
+
+
+async def _image_url(db: AsyncSession, img: ImageModel, variant: Optional[str]) -> str:
+    """
+    Download URL for an image (or variant).
+    With presigning backends the URL is cached per (object, variant) and
+    reused while enough of its lifetime is left: signing is local, but
+    resolving the variant may hit the database. A variant that fails to
+    render is replaced by the original, uncached so the next call retries.
+    Other backends point at GET /media/{id}/content.
+    """
+    if not storage.direct_urls:
+        return _content_url(img.id, variant)
+    cache_key = (img.storage_url, variant)
+    url = presign_cache.get(cache_key)
+    if url is None:
+        try:
+            key = await variant_key(db, storage, img, variant)
+        except VariantUnavailable:
+            return await storage.presign(img.storage_url)
+        url = await storage.presign(key)
+        presign_cache.set(cache_key, url, PRESIGN_CACHE_TTL)
+    return url
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _not_modified(request: Request, etag: str, cache_control: str) -> Optional[Response]:
+    """304 response if the client already has this representation."""
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": cache_control},
+        )
+    return None
+
+
+async def _load_image(db: AsyncSession, media_id: uuid.UUID) -> ImageModel:
+    """
+    Live Image row by id, or 404. Rows are cached detached from the session;
+    they are only read, and deletes drop them via _forget_image(). A row read
+    while a delete commits may predate it, so it is served but not cached.
+    """
+    img = meta_cache.get(media_id)
+    if img is None:
+        generation = _meta_generation
+        res = await db.execute(select(ImageModel).where(ImageModel.id == media_id))
+        img = res.scalar_one_or_none()
+        if not img or img.is_deleted:
+            raise HTTPException(404, "Not found")
+        db.expunge(img)
+        if generation == _meta_generation:
+            meta_cache.set(media_id, img, MEDIA_META_CACHE_TTL)
+    return img
+
+
+def _forget_image(media_id: uuid.UUID) -> None:
+    """Drop a deleted image from the cache; call after the delete commits."""
+    global _meta_generation
+    _meta_generation += 1
+    meta_cache.pop(media_id)
+
+
+def _forget_urls(storage_url: str) -> None:
+    for variant in (None, *VARIANTS):
+        presign_cache.pop((storage_url, variant))
+
+
+def _blob_key(sha256: str) -> str:
+    """
+    Object key for a new blob of this content. The random suffix makes every
+    blob generation its own object: once a blob row is gone its key is never
+    written again, so the object can be deleted after the commit.
+    """
+    return f"blobs/{sha256[:2]}/{sha256}-{secrets.token_hex(8)}"
+
+
+class _UploadDigest:
+    """Size, SHA-256 and leading header bytes of an upload, computed chunk by chunk."""
+
+    def __init__(self) -> None:
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.header = bytearray()
+
+    def update(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File is larger than {MAX_UPLOAD_BYTES} bytes",
+            )
+        self.sha256.update(chunk)
+        if len(self.header) < HEADER_SNIFF_BYTES:
+            self.header += chunk[:HEADER_SNIFF_BYTES - len(self.header)]
+
+
+async def _inspect_upload(file: UploadFile) -> _UploadDigest:
+    """First pass over the (spooled) upload: hash, size and header, chunk by chunk."""
+    digest = _UploadDigest()
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        await cpu_pool.run(digest.update, chunk)
+    if digest.size == 0:
+        raise HTTPException(400, "Empty file")
+    await file.seek(0)
+    return digest
+
+
+async def _acquire_blob(db: AsyncSession, file: UploadFile, digest: _UploadDigest, mime: str) -> str:
+    """
+    Take a reference on the blob for this content, uploading it only if
+    no image with the same sha256 exists yet. Returns the blob key.
+    The caller commits together with the Image row.
+    """
+    sha256 = digest.sha256.hexdigest()
+    existing = await _reference_blob(db, sha256)
+    if existing:
+        return existing
+
+    key = _blob_key(sha256)
+    await storage.put_stream(key, file, mime)
+    try:
+        # savepoint: losing the race must not roll back the caller's transaction
+        async with db.begin_nested():
+            db.add(Blob(sha256=sha256, storage_key=key, size_bytes=digest.size, mime_type=mime, ref_count=1))
+    except IntegrityError:
+        # a concurrent upload of the same content created the blob first:
+        # take a reference on theirs and drop our copy, which nothing points at
+        existing = await _reference_blob(db, sha256)
+        await _delete_objects([key])
+        if not existing:
+            raise HTTPException(status_code=409, detail="Concurrent upload conflict, retry")
+        return existing
+    return key
+
+
+async def _reference_blob(db: AsyncSession, sha256: str) -> Optional[str]:
+    """Take one more reference on an existing blob; returns its key, or None if there is none."""
+    res = await db.execute(
+        update(Blob).where(Blob.sha256 == sha256).values(ref_count=Blob.ref_count + 1).returning(Blob.storage_key)
+    )
+    return res.scalar_one_or_none()
+
+
+async def _delete_objects(keys: List[str]) -> None:
+    """Delete stored objects no row points at any more. Failures are logged, not raised."""
+    try:
+        await storage.delete(keys)
+    except Exception:
+        logger.exception("Deleting stored objects %s failed", keys)
+
+
+async def _release_blob(db: AsyncSession, sha256: str) -> Optional[str]:
+    """
+    Drop one reference on a blob. When it was the last one, the blob row is
+    deleted and its key returned; the caller deletes the object after commit.
+    """
+    await db.execute(
+        update(Blob).where(Blob.sha256 == sha256).values(ref_count=Blob.ref_count - 1)
+    )
+    res = await db.execute(
+        delete(Blob).where(Blob.sha256 == sha256, Blob.ref_count <= 0).returning(Blob.storage_key)
+    )
+    return res.scalar_one_or_none()
 
 
 @router.post("", status_code=status.HTTP_201_CREATED)
@@ -70,27 +256,22 @@ async def upload_media(
     principal: Optional[Principal] = Depends(get_principal),
 ):
     """
-    Upload image to S3 and persist metadata.
+    Upload image to storage and persist metadata.
     - USER: verified via /users/verify-access inside get_principal(),
              MUST be ImageKind.input, prompt ignored.
     - SERVICE: verified via Bearer JWT (typ=service + nonce confirmed in get_principal()),
                MUST provide X-Prompt, saved as ImageKind.gen.
     - Reads are public; writes require USER or SERVICE.
+    - Starlette has already spooled the body (to disk past 1 MiB). It is then
+      read in UPLOAD_CHUNK_BYTES chunks; S3 holds at most one UPLOAD_PART_BYTES
+      part in memory. Bodies over MAX_UPLOAD_BYTES get 413 before anything is stored.
+    - Storage is content-addressed: identical files share one stored object,
+      which is uploaded only once.
     """
     if principal is None:
         raise HTTPException(status_code=401, detail="Authentication required")
 
-    content = await file.read()
-    if not content:
-        raise HTTPException(400, "Empty file")
-
-    w, h = await _get_image_size(content)
-    sha256 = hashlib.sha256(content).hexdigest()
-    media_id = uuid.uuid4()
-    key = _make_key(x_chat_id, media_id, file.filename)
-    mime = file.content_type or "application/octet-stream"
-
-    # enforce per-mode rules
+    # enforce per-mode rules before touching the body
     if principal.mode is PrincipalMode.USER:
         require_user(principal)
         kind = ImageKind.INPUT
@@ -104,33 +285,34 @@ async def upload_media(
     else:
         raise HTTPException(status_code=401, detail="Unsupported principal mode")
 
-    # upload object to S3 (bucket must already exist)
-    async with _s3_client() as s3:
-        try:
-            await s3.put_object(
-                Bucket=S3_BUCKET,
-                Key=key,
-                Body=content,
-                ContentType=mime,
-            )
-        except s3.exceptions.NoSuchBucket:
-            raise HTTPException(
-                status_code=500,
-                detail=f"S3 bucket '{S3_BUCKET}' does not exist. Create it manually before running the service.",
-            )
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File is larger than {MAX_UPLOAD_BYTES} bytes",
+        )
+
+    mime = file.content_type or "application/octet-stream"
+    digest = await _inspect_upload(file)
+    sha256 = digest.sha256.hexdigest()
+
+    # dimensions are sniffed from the header bytes only
+    w, h = await cpu_pool.run(_get_image_size, bytes(digest.header))
+
+    key = await _acquire_blob(db, file, digest, mime)
 
     # persist metadata
     img = ImageModel(
-        id=media_id,
+        id=uuid.uuid4(),
         chat_id=uuid.UUID(x_chat_id),
         owner_id=uuid.UUID(principal.user_id) if principal.mode is PrincipalMode.USER else None,
         kind=kind,                 # enum
         mime_type=mime,
         width=w,
         height=h,
-        size_bytes=len(content),
+        size_bytes=digest.size,
         sha256=sha256,
         storage_url=key,           
+        blob_sha256=sha256,
         prompt=prompt,             
     )
 
@@ -142,37 +324,162 @@ async def upload_media(
 @router.get("/{media_id}", response_model=MediaOut)
 async def get_media_meta(
     media_id: uuid.UUID,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
 ):
-    """Public: return metadata for an image by id."""
-    res = await db.execute(select(ImageModel).where(ImageModel.id == media_id))
-    img = res.scalar_one_or_none()
-
-    if not img or img.is_deleted:
-        raise HTTPException(status_code=404, detail="Not found")
+    """
+    Public: return metadata for an image by id.
+    Cacheable; honours If-None-Match (304).
+    """
+    img = await _load_image(db, media_id)
 
+    etag = f'"meta-{img.sha256 or img.id}"'
+    cache_control = f"public, max-age={MEDIA_META_MAX_AGE}"
+    not_modified = _not_modified(request, etag, cache_control)
+    if not_modified:
+        return not_modified
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
     return MediaOut.model_validate(img)
 
 
 @router.get("/{media_id}/url")
 async def get_presigned_url(
+    media_id: uuid.UUID,
+    request: Request,
+    response: Response,
+    variant: Optional[str] = Query(None, description="Resized variant, e.g. 'llm' (long side <= 1024)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Public: return a presigned URL for downloading the file (or one of its resized variants).
+    The ETag follows the URL, so it stays valid for as long as the URL is reused.
+    """
+    validate_variant(variant)
+    img = await _load_image(db, media_id)
+
+    url = await _image_url(db, img, variant)
+    etag = '"url-' + hashlib.sha256(url.encode("utf8")).hexdigest()[:32] + '"'
+    cache_control = f"private, max-age={MEDIA_URL_MAX_AGE}"
+    not_modified = _not_modified(request, etag, cache_control)
+    if not_modified:
+        return not_modified
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return {"media_id": str(img.id), "url": url}
+
+
+@router.get("/{media_id}/content")
+async def get_media_content(
+    media_id: uuid.UUID,
+    request: Request,
+    variant: Optional[str] = Query(None, description="Resized variant, e.g. 'llm' (long side <= 1024)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Public: the image bytes (or a resized variant).
+    Local storage is served straight from disk, with Range requests and an
+    ETag derived from the content sha256. Presigning backends redirect to
+    the object URL instead. If a variant cannot be rendered the original is
+    served under its own ETag and with a short max-age.
+    """
+    validate_variant(variant)
+    img = await _load_image(db, media_id)
+
+    if storage.direct_urls:
+        return RedirectResponse(await _image_url(db, img, variant), status_code=307)
+
+    cache_control = f"public, max-age={MEDIA_CONTENT_MAX_AGE}"
+    etag = None
+    if img.sha256:
+        # known before the variant is resolved: a revalidation never renders one
+        etag = f'"{img.sha256}.{variant}"' if variant else f'"{img.sha256}"'
+        not_modified = _not_modified(request, etag, cache_control)
+        if not_modified:
+            return not_modified
+
+    try:
+        key = await variant_key(db, storage, img, variant)
+    except VariantUnavailable:
+        key = img.storage_url
+        cache_control = f"public, max-age={MEDIA_FALLBACK_MAX_AGE}"
+        if img.sha256:
+            etag = f'"{img.sha256}"'
+            not_modified = _not_modified(request, etag, cache_control)
+            if not_modified:
+                return not_modified
+    headers = {"Cache-Control": cache_control}
+    if etag:
+        headers["ETag"] = etag
+    is_original = key == img.storage_url
+    path = storage.local_path(key)
+    if not os.path.exists(path):
+        raise HTTPException(404, "Not found")
+    return FileResponse(
+        path,
+        media_type=img.mime_type if is_original else variant_mime(variant),
+        headers=headers,
+    )
+
+
+@router.post("/urls", response_model=MediaUrls)
+async def get_presigned_urls(
+    payload: MediaIdsIn,
+    db: AsyncSession = Depends(get_db),
+):
+    """Public: return presigned URLs for many images at once. Unknown or deleted ids are omitted."""
+    if len(payload.ids) > MEDIA_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MEDIA_BATCH_MAX_IDS} ids per request")
+    validate_variant(payload.variant)
+    if not payload.ids:
+        return MediaUrls(urls=[])
+
+    res = await db.execute(
+        select(ImageModel).where(ImageModel.id.in_(payload.ids), ImageModel.is_deleted == False)
+    )
+    images = res.scalars().all()
+
+    urls = [
+        MediaUrl(media_id=img.id, url=await _image_url(db, img, payload.variant))
+        for img in images
+    ]
+    return MediaUrls(urls=urls)
+
+
+
+@router.delete("/{media_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_media(
     media_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_principal),
 ):
-    """Public: return a presigned URL for downloading the file."""
-    res = await db.execute(select(ImageModel).where(ImageModel.id == media_id))
+    """
+    Soft-delete an image. USER may delete own images only; SERVICE may delete any.
+    The stored object is removed, after commit, once no live image references
+    its blob. If that fails, media GC deletes it when it purges the image.
+    """
+    if principal is None:
+        raise HTTPException(status_code=401, detail="Authentication required")
+
+    res = await db.execute(select(ImageModel).where(ImageModel.id == media_id).with_for_update())
     img = res.scalar_one_or_none()
     if not img or img.is_deleted:
         raise HTTPException(404, "Not found")
+    if principal.mode is PrincipalMode.USER and str(img.owner_id) != str(principal.user_id):
+        raise HTTPException(status_code=403, detail="Not the owner of this image")
 
-    async with _s3_client() as s3:
-        try:
-            url = await s3.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": S3_BUCKET, "Key": img.storage_url},
-                ExpiresIn=PRESIGN_EXPIRES,
-            )
-        except s3.exceptions.NoSuchBucket:
-            raise HTTPException(status_code=500, detail=f"Bucket '{S3_BUCKET}' not found.")
-    return {"media_id": str(img.id), "url": url}
+    img.is_deleted = True
+    img.deleted_at = datetime.now(timezone.utc)
+
+    # legacy per-image objects are never shared
+    key = await _release_blob(db, img.blob_sha256) if img.blob_sha256 else img.storage_url
+    keys = [key, *await drop_variants(db, key)] if key else []
+    await db.commit()
 
+    # only now: a read before the commit would cache the row as still live
+    _forget_image(media_id)
+    if key:
+        # blob keys are never reused (see _blob_key), so no upload can race this
+        await _delete_objects(keys)
+        _forget_urls(key)
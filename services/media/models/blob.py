@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import String, Integer, DateTime, CheckConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from ..db.base import Base
+
+
+class Blob(Base):
+    """Content-addressed S3 object shared by every Image with the same sha256."""
+    __tablename__ = "blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    storage_key: Mapped[str] = mapped_column(String, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    mime_type: Mapped[str] = mapped_column(String(64), nullable=False)
+    # number of live (not soft-deleted) images pointing at this blob
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
+    )
+
+    __table_args__ = (
+        CheckConstraint("ref_count >= 0", name="blobs_ref_count_nonneg"),
+    )
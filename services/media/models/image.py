@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import String, Integer, Boolean, DateTime, Enum as SQLEnum, CheckConstraint, Index, ForeignKey
+from sqlalchemy import String, Integer, Boolean, DateTime, Enum as SQLEnum, CheckConstraint, Index, ForeignKey, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 from ..db.base import Base
@@ -24,9 +24,18 @@ class Image(Base):
     size_bytes: Mapped[int | None] = mapped_column(Integer, nullable=True)
     sha256: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True) 
     storage_url: Mapped[str] = mapped_column(String, nullable=False)
+    # set for content-addressed uploads (storage_url is then the blob key); NULL for legacy per-image objects
+    blob_sha256: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
     owner_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True, index=True)
 
     prompt: Mapped[str | None] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+        nullable=False,
+        index=True,
+    )
 
     # soft delete
     is_deleted: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False, index=True)
@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import String, Integer, DateTime, PrimaryKeyConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from ..db.base import Base
+
+
+class ImageVariant(Base):
+    """Resized derivative of a stored object (e.g. 'llm' = long side <= 1024)."""
+    __tablename__ = "image_variants"
+    __table_args__ = (
+        PrimaryKeyConstraint("source_key", "variant", name="pk_image_variant"),
+    )
+
+    # storage key of the original object; variants live and die with it
+    source_key: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    variant: Mapped[str] = mapped_column(String(32), nullable=False)
+    storage_key: Mapped[str] = mapped_column(String, nullable=False)
+    mime_type: Mapped[str] = mapped_column(String(64), nullable=False)
+    width: Mapped[int] = mapped_column(Integer, nullable=False)
+    height: Mapped[int] = mapped_column(Integer, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
+    )
@@ -1,18 +1,32 @@
 import os
 import jwt
+import hashlib
 import httpx
 from typing import Optional, List
 
 from fastapi import Header, HTTPException, Request, status
 from pydantic import BaseModel
 from .media_enums import PrincipalMode
+from .clients import clients
+from ..jwt_keys import KeyRing
+from ..cache import Coalescer
+from ..signed_nonce import is_signed, verify as verify_signed_nonce, InvalidNonce, ReplayFilter
 #from schemas.auth import VerifyAccessIn
 
 # === Configuration ===
 JWT_SECRET = os.getenv("JWT_DEV_SECRET", "dev-secret")
 JWT_ALG = os.getenv("JWT_ALG", "HS256")
-USERS_SERVICE_BASE = os.getenv("USERS_SERVICE_BASE", "http://users:8000")
-NONCE_SERVICE_BASE = os.getenv("NONCE_SERVICE_BASE", "http://185.106.95.104:8000")
+# remote: ask users-service /users/verify-access; local: verify access JWT with shared keys
+AUTH_VERIFY_MODE = os.getenv("AUTH_VERIFY_MODE", "remote")
+access_keys = KeyRing.from_env()
+# concurrent verifications of the same (user, token) share one users-service call
+verification_flights = Coalescer()
+
+# Signed (stateless) nonces: validated here instead of a nonce-service round trip
+NONCE_SIGNING_SECRET = os.getenv("NONCE_SIGNING_SECRET")
+# local: single-use enforced in this process; service: shared via nonce-service /consume
+NONCE_REPLAY = os.getenv("NONCE_REPLAY", "local")
+replay_filter = ReplayFilter()
 
 
 class Principal(BaseModel):
@@ -24,25 +38,33 @@ class Principal(BaseModel):
     scopes: List[str] = []
 
 
+def _verify_user_credentials_local(user_id: str, access_key: str) -> bool:
+    try:
+        claims = access_keys.decode_access(access_key)
+    except jwt.PyJWTError:
+        return False
+    return str(claims.get("sub")) == str(user_id) and claims.get("is_active", True) is not False
+
 async def verify_user_credentials(user_id: str, access_key: str) -> bool:
-    """Verify user credentials via Users service."""
-    url = f"{USERS_SERVICE_BASE}/users/verify-access"
-    data = {"user_id": str(user_id), "access_key": access_key}
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        try:
-            r = await client.post(url, json=data)
-            return r.status_code == 200
-        except httpx.RequestError:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Users service unavailable",
-            )
+    """Verify user credentials locally or via Users service (AUTH_VERIFY_MODE)."""
+    if AUTH_VERIFY_MODE == "local":
+        return _verify_user_credentials_local(user_id, access_key)
+    key = (str(user_id), hashlib.sha256(access_key.encode("utf8")).hexdigest())
+    return await verification_flights.run(key, lambda: _verify_user_credentials_remote(user_id, access_key))
 
-async def _confirm_nonce_or_401(nonce: str) -> None:
-    """Confirm single-use nonce at Nonce-service."""
-    url = f"{NONCE_SERVICE_BASE}/nonce/confirm"
-    async with httpx.AsyncClient(timeout=3.0) as c:
-        r = await c.post(url, json={"nonce": nonce})
+async def _verify_user_credentials_remote(user_id: str, access_key: str) -> bool:
+    data = {"user_id": str(user_id), "access_key": access_key}
+    try:
+        r = await clients.get("users").post("/users/verify-access", json=data)
+        return r.status_code == 200
+    except httpx.RequestError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Users service unavailable",
+        )
+
+def _check_nonce_response(r: httpx.Response) -> None:
+    """Map a Nonce-service confirm/consume response to 401/503."""
     if r.status_code == 404:
         raise HTTPException(status_code=401, detail="Nonce not found or expired")
     if r.status_code == 409:
@@ -50,6 +72,26 @@ async def _confirm_nonce_or_401(nonce: str) -> None:
     if r.status_code != 204:
         raise HTTPException(status_code=503, detail="Nonce service unavailable")
 
+async def _confirm_signed_nonce_or_401(nonce: str) -> None:
+    """Validate a self-describing nonce locally, then enforce single use."""
+    if not NONCE_SIGNING_SECRET:
+        raise HTTPException(status_code=401, detail="Signed nonces are not accepted")
+    try:
+        nid, exp = verify_signed_nonce(nonce, NONCE_SIGNING_SECRET)
+    except InvalidNonce:
+        raise HTTPException(status_code=401, detail="Nonce not found or expired")
+
+    if NONCE_REPLAY == "service":
+        _check_nonce_response(await clients.get("nonce").post("/nonce/consume", json={"nonce": nonce}))
+    elif not replay_filter.add(nid, exp):
+        raise HTTPException(status_code=401, detail="Nonce reused")
+
+async def _confirm_nonce_or_401(nonce: str) -> None:
+    """Confirm single-use nonce (signed locally, or issued by Nonce-service)."""
+    if is_signed(nonce):
+        return await _confirm_signed_nonce_or_401(nonce)
+    _check_nonce_response(await clients.get("nonce").post("/nonce/confirm", json={"nonce": nonce}))
+
 async def get_principal(
     request: Request,
     authorization: Optional[str] = Header(default=None, alias="Authorization"),
@@ -0,0 +1,328 @@
+import os
+import logging
+import tempfile
+from contextlib import AsyncExitStack
+from typing import Any, Optional, Sequence
+
+import aioboto3
+from aiobotocore.config import AioConfig
+from fastapi import HTTPException, UploadFile
+
+from ..cache import TTLCache
+from ..executors import BoundedExecutor
+
+logger = logging.getLogger(__name__)
+
+# s3: objects in an S3 bucket, served via presigned URLs
+# local: files under MEDIA_LOCAL_ROOT, served by GET /media/{id}/content
+MEDIA_STORAGE = os.getenv("MEDIA_STORAGE", "s3")
+MEDIA_LOCAL_ROOT = os.getenv("MEDIA_LOCAL_ROOT", "./media-data")
+
+# S3 config (bucket must already exist)
+S3_ENDPOINT = os.getenv("S3_ENDPOINT", "https://storage.clo.ru")
+S3_BUCKET = os.getenv("S3_BUCKET", "llm-chat-images")
+S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY")
+S3_SECRET_KEY = os.getenv("S3_SECRET_KEY")
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50"))
+PRESIGN_EXPIRES = int(os.getenv("S3_PRESIGN_TTL", "900"))  # seconds
+
+# Upload streaming
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))      # read size
+UPLOAD_PART_BYTES = int(os.getenv("UPLOAD_PART_BYTES", str(8 * 1024 * 1024)))    # S3 part size, >= 5 MiB
+
+# A cached presigned URL is handed out only while at least this fraction of
+# its lifetime is left, so clients always get >= PRESIGN_EXPIRES * fraction
+PRESIGN_MIN_REMAINING = float(os.getenv("PRESIGN_MIN_REMAINING", "0.5"))
+PRESIGN_CACHE_SIZE = int(os.getenv("PRESIGN_CACHE_SIZE", "10000"))
+
+# S3 DeleteObjects accepts at most this many keys per call
+S3_DELETE_BATCH = 1000
+
+# Blocking file I/O of the local backend
+MEDIA_IO_WORKERS = int(os.getenv("MEDIA_IO_WORKERS", "8"))
+
+
+class StorageDeleteError(Exception):
+    """Some objects could not be deleted; `keys` lists them."""
+
+    def __init__(self, keys: Sequence[str], detail: str) -> None:
+        super().__init__(f"Failed to delete {len(keys)} object(s): {detail}")
+        self.keys = list(keys)
+
+
+class StorageBackend:
+    """
+    Where media objects live. Keys are relative, '/'-separated paths.
+    Backends with direct_urls hand out their own download URLs (presign());
+    the others are served by the media service itself (local_path()).
+    """
+
+    direct_urls: bool = False
+
+    async def start(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+    async def put_stream(self, key: str, file: UploadFile, mime: str) -> None:
+        """Store an upload, reading it in UPLOAD_CHUNK_BYTES chunks."""
+        raise NotImplementedError
+
+    async def put(self, key: str, data: bytes, mime: str) -> None:
+        raise NotImplementedError
+
+    async def read(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    async def delete(self, keys: Sequence[str]) -> None:
+        """Delete objects; missing keys are ignored. Raises StorageDeleteError if some failed."""
+        raise NotImplementedError
+
+    async def presign(self, key: str) -> Optional[str]:
+        """Time-limited download URL, or None if objects are served by the media service."""
+        return None
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path of an object, for backends that serve from local disk."""
+        return None
+
+
+class S3Storage(StorageBackend):
+    """
+    One aioboto3 S3 client for the whole process: credentials, endpoint and
+    the connection pool are set up once in start(). The client opens lazily
+    on first use, for scripts running outside the app.
+    """
+
+    direct_urls = True
+
+    def __init__(self) -> None:
+        self._stack: Optional[AsyncExitStack] = None
+        self._client: Any = None
+
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+        self._stack = AsyncExitStack()
+        self._client = await self._stack.enter_async_context(
+            aioboto3.Session().client(
+                "s3",
+                endpoint_url=S3_ENDPOINT,
+                aws_access_key_id=S3_ACCESS_KEY,
+                aws_secret_access_key=S3_SECRET_KEY,
+                config=AioConfig(max_pool_connections=S3_MAX_POOL_CONNECTIONS),
+            )
+        )
+
+    async def client(self) -> Any:
+        if self._client is None:
+            await self.start()
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._stack is not None:
+            await self._stack.aclose()
+        self._stack = None
+        self._client = None
+
+    def _no_bucket(self) -> HTTPException:
+        return HTTPException(
+            status_code=500,
+            detail=f"S3 bucket '{S3_BUCKET}' does not exist. Create it manually before running the service.",
+        )
+
+    async def put_stream(self, key: str, file: UploadFile, mime: str) -> None:
+        """
+        Bodies up to UPLOAD_PART_BYTES go in a single put_object, larger ones as
+        a multipart upload, so at most one part is held in memory.
+        """
+        s3 = await self.client()
+        buf = bytearray()
+        upload_id: Optional[str] = None
+        parts: list[dict] = []
+
+        async def flush_part() -> None:
+            nonlocal buf
+            part_number = len(parts) + 1
+            resp = await s3.upload_part(
+                Bucket=S3_BUCKET, Key=key, UploadId=upload_id,
+                PartNumber=part_number, Body=bytes(buf),
+            )
+            parts.append({"ETag": resp["ETag"], "PartNumber": part_number})
+            buf = bytearray()
+
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                buf += chunk
+                if len(buf) >= UPLOAD_PART_BYTES:
+                    if upload_id is None:
+                        resp = await s3.create_multipart_upload(Bucket=S3_BUCKET, Key=key, ContentType=mime)
+                        upload_id = resp["UploadId"]
+                    await flush_part()
+
+            if upload_id is None:
+                await s3.put_object(Bucket=S3_BUCKET, Key=key, Body=bytes(buf), ContentType=mime)
+            else:
+                if buf:
+                    await flush_part()
+                await s3.complete_multipart_upload(
+                    Bucket=S3_BUCKET, Key=key, UploadId=upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+        except s3.exceptions.NoSuchBucket:
+            raise self._no_bucket()
+        except BaseException:
+            if upload_id is not None:
+                # a failed abort must not mask the original error; the bucket's
+                # AbortIncompleteMultipartUpload lifecycle rule catches leftovers
+                try:
+                    await s3.abort_multipart_upload(Bucket=S3_BUCKET, Key=key, UploadId=upload_id)
+                except Exception:
+                    logger.exception("Aborting multipart upload %s of %s failed", upload_id, key)
+            raise
+
+    async def put(self, key: str, data: bytes, mime: str) -> None:
+        s3 = await self.client()
+        await s3.put_object(Bucket=S3_BUCKET, Key=key, Body=data, ContentType=mime)
+
+    async def read(self, key: str) -> bytes:
+        s3 = await self.client()
+        obj = await s3.get_object(Bucket=S3_BUCKET, Key=key)
+        async with obj["Body"] as body:
+            return await body.read()
+
+    async def delete(self, keys: Sequence[str]) -> None:
+        if not keys:
+            return
+        s3 = await self.client()
+        if len(keys) == 1:
+            await s3.delete_object(Bucket=S3_BUCKET, Key=keys[0])
+            return
+        errors: list[dict] = []
+        for i in range(0, len(keys), S3_DELETE_BATCH):
+            resp = await s3.delete_objects(
+                Bucket=S3_BUCKET,
+                Delete={"Objects": [{"Key": k} for k in keys[i:i + S3_DELETE_BATCH]], "Quiet": True},
+            )
+            # DeleteObjects answers 200 even when single keys fail
+            errors.extend(resp.get("Errors", []))
+        if errors:
+            first = errors[0]
+            raise StorageDeleteError(
+                [e.get("Key") for e in errors], f"{first.get('Code')}: {first.get('Message')}",
+            )
+
+    async def presign(self, key: str) -> Optional[str]:
+        s3 = await self.client()
+        try:
+            return await s3.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": S3_BUCKET, "Key": key},
+                ExpiresIn=PRESIGN_EXPIRES,
+            )
+        except s3.exceptions.NoSuchBucket:
+            raise HTTPException(status_code=500, detail=f"Bucket '{S3_BUCKET}' not found.")
+
+
+def _write_file(f, chunk: bytes) -> None:
+    f.write(chunk)
+
+
+def _finish_file(f, tmp: str, path: str) -> None:
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+    os.replace(tmp, path)
+
+
+def _discard_file(f, tmp: str) -> None:
+    f.close()
+    try:
+        os.remove(tmp)
+    except FileNotFoundError:
+        pass
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _remove_files(paths: Sequence[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class LocalStorage(StorageBackend):
+    """
+    Objects as files under `root`. Writes go to a temporary file in the
+    target directory and are renamed into place, so readers never see a
+    partial object. Blocking file I/O runs in io_pool.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+        self.io_pool = BoundedExecutor("media-io", MEDIA_IO_WORKERS)
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Storage key escapes the storage root: {key}")
+        return path
+
+    def _open_tmp(self, path: str):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        return os.fdopen(fd, "wb"), tmp
+
+    async def _write(self, key: str, chunks) -> None:
+        path = self.local_path(key)
+        f, tmp = await self.io_pool.run(self._open_tmp, path)
+        try:
+            async for chunk in chunks:
+                await self.io_pool.run(_write_file, f, chunk)
+            await self.io_pool.run(_finish_file, f, tmp, path)
+        except BaseException:
+            await self.io_pool.run(_discard_file, f, tmp)
+            raise
+
+    async def put_stream(self, key: str, file: UploadFile, mime: str) -> None:
+        async def chunks():
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                yield chunk
+        await self._write(key, chunks())
+
+    async def put(self, key: str, data: bytes, mime: str) -> None:
+        async def chunks():
+            yield data
+        await self._write(key, chunks())
+
+    async def read(self, key: str) -> bytes:
+        return await self.io_pool.run(_read_file, self.local_path(key))
+
+    async def delete(self, keys: Sequence[str]) -> None:
+        if keys:
+            await self.io_pool.run(_remove_files, [self.local_path(k) for k in keys])
+
+    async def aclose(self) -> None:
+        self.io_pool.shutdown()
+
+
+def build_storage(backend: str) -> StorageBackend:
+    if backend == "s3":
+        return S3Storage()
+    if backend == "local":
+        return LocalStorage(MEDIA_LOCAL_ROOT)
+    raise ValueError(f"Unknown MEDIA_STORAGE backend: {backend}")
+
+
+storage = build_storage(MEDIA_STORAGE)
+
+# (storage_url, variant) -> presigned URL of the object served for it
+presign_cache = TTLCache(PRESIGN_CACHE_SIZE)
+PRESIGN_CACHE_TTL = PRESIGN_EXPIRES * (1 - PRESIGN_MIN_REMAINING)
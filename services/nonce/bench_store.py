@@ -0,0 +1,117 @@
+"""
+Nonce issue/confirm cost with many live nonces: the old dict + global lock +
+full expiry scan per request vs MemoryNonceStore.
+
+    python -m services.nonce.bench_store [live] [ops]
+    NONCE_REDIS_URL=redis://localhost:6379/0 python -m services.nonce.bench_store 100000
+
+The store is pre-filled with `live` unexpired nonces (default 100,000),
+then `ops` issue+confirm pairs run concurrently. RedisNonceStore is included
+when NONCE_REDIS_URL is set. Finally the heap sweep of `live` expired
+entries is timed.
+"""
+import os
+import sys
+import time
+import heapq
+import secrets
+import asyncio
+from typing import Dict, List, Tuple
+
+from .store import MemoryNonceStore, RedisNonceStore, NonceStore, _now
+
+TTL = 600.0  # bench keys left in Redis expire on their own
+
+
+class LegacyStore(NonceStore):
+    """The previous in-memory implementation, for comparison."""
+
+    def __init__(self) -> None:
+        self._storage: Dict[str, Tuple[bool, float]] = {}
+        self._lock = asyncio.Lock()
+
+    def _cleanup_expired(self) -> None:
+        now = _now()
+        for k in [k for k, (_, exp) in self._storage.items() if exp <= now]:
+            self._storage.pop(k, None)
+
+    async def issue(self, value: str, ttl: float) -> bool:
+        async with self._lock:
+            self._cleanup_expired()
+            if value in self._storage:
+                return False
+            self._storage[value] = (False, _now() + ttl)
+            return True
+
+    async def confirm(self, value: str) -> bool:
+        async with self._lock:
+            self._cleanup_expired()
+            return self._storage.pop(value, None) is not None
+
+
+def _pct(samples: List[float], p: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * p))] * 1000 if s else 0.0
+
+
+async def _fill(store: NonceStore, live: int) -> None:
+    if isinstance(store, LegacyStore):
+        exp = _now() + TTL
+        store._storage.update((secrets.token_hex(32), (False, exp)) for _ in range(live))
+    else:
+        for _ in range(live):
+            await store.issue(secrets.token_hex(32), TTL)
+
+
+async def _measure(name: str, store: NonceStore, live: int, ops: int) -> None:
+    await _fill(store, live)
+    latencies: List[float] = []
+
+    async def pair() -> None:
+        value = secrets.token_hex(32)
+        start = time.perf_counter()
+        assert await store.issue(value, TTL)
+        assert await store.confirm(value)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(pair() for _ in range(ops)))
+    elapsed = time.perf_counter() - start
+    print(f"{name:>8}: {ops / elapsed:>9.0f} pairs/s  issue+confirm p50={_pct(latencies, .5):.3f}ms "
+          f"p99={_pct(latencies, .99):.3f}ms")
+
+
+def _sweep(live: int) -> None:
+    store = MemoryNonceStore(sweep_interval=1.0)
+    exp = _now() - 1
+    for _ in range(live):
+        value = secrets.token_hex(32)
+        store._expires[value] = exp
+        heapq.heappush(store._heap, (exp, value))
+    start = time.perf_counter()
+    removed = store.sweep()
+    print(f"   sweep: {removed} expired nonces in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+async def main() -> None:
+    live = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    print(f"live nonces={live} concurrent issue+confirm pairs={ops}")
+
+    # each legacy op scans every live nonce; keep its run short
+    await _measure("legacy", LegacyStore(), live, max(1, min(ops, 200)))
+    await _measure("memory", MemoryNonceStore(sweep_interval=1.0), live, ops)
+
+    redis_url = os.getenv("NONCE_REDIS_URL")
+    if redis_url:
+        store = RedisNonceStore(redis_url, prefix="bench-nonce:")
+        try:
+            await _measure("redis", store, live, ops)
+        finally:
+            await store.close()
+
+    _sweep(live)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,17 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from .nonce import router
+from .nonce import router, store
 from fastapi import FastAPI
 
 app = FastAPI(title="Nonce Service")
-app.include_router(router, prefix="/v1/nonce")
 
+@app.on_event("startup")
+async def on_startup() -> None:
+    await store.start()
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await store.close()
+
+app.include_router(router, prefix="/v1/nonce")
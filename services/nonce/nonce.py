@@ -2,51 +2,52 @@ import os
 import time
 import secrets
 import asyncio
-from typing import Dict, Tuple
 
-from fastapi import APIRouter, HTTPException, status
-from ..schemas.nonce import Nonce
+from fastapi import APIRouter, HTTPException, Query, status
+from ..schemas.nonce import Nonce, NonceBatch
+from .store import build_store
+from ..signed_nonce import verify as verify_signed_nonce, InvalidNonce
 
 router = APIRouter(tags=["nonce"])
 
 # Config
 NONCE_BYTES = int(os.getenv("NONCE_BYTES", "32"))   # 32 bytes -> 64 hex chars
 NONCE_TTL   = int(os.getenv("NONCE_TTL", "30"))     # seconds
+NONCE_SWEEP_INTERVAL = float(os.getenv("NONCE_SWEEP_INTERVAL", "5"))  # seconds, memory store only
+NONCE_STORE = os.getenv("NONCE_STORE", "memory")    # memory | redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+NONCE_REDIS_PREFIX = os.getenv("NONCE_REDIS_PREFIX", "nonce:")
+NONCE_SIGNING_SECRET = os.getenv("NONCE_SIGNING_SECRET")
+NONCE_BATCH_MAX = int(os.getenv("NONCE_BATCH_MAX", "64"))
 
-# In-memory storage: nonce -> (used: bool, expires_at: float)
-_storage: Dict[str, Tuple[bool, float]] = {}
-_lock = asyncio.Lock()
+# memory: single process only; redis: shared by all workers/replicas
+store = build_store(NONCE_STORE, NONCE_SWEEP_INTERVAL, REDIS_URL, NONCE_REDIS_PREFIX)
 
 
-def _now() -> float:
-    return time.time()
-
-
-async def _cleanup_expired() -> None:
-    """Remove expired nonces from in-memory storage."""
-    now = _now()
-    to_del = [k for k, (_, exp) in _storage.items() if exp <= now]
-    for k in to_del:
-        _storage.pop(k, None)
+async def _new_nonce() -> str:
+    # Try until we get a unique value (extremely unlikely to collide)
+    while True:
+        value = secrets.token_hex(NONCE_BYTES)
+        if await store.issue(value, NONCE_TTL):
+            return value
 
 
 @router.post("", response_model=Nonce, status_code=status.HTTP_201_CREATED)
 async def issue_nonce() -> Nonce:
     """
     Issue a fresh nonce (hex) and store it as 'unused' with TTL.
-    This is an in-memory prototype; replace with Redis in microservice form.
     """
-    async with _lock:
-        await _cleanup_expired()
+    return Nonce(nonce=await _new_nonce())
 
-        # Try until we get a unique value (extremely unlikely to collide)
-        while True:
-            value = secrets.token_hex(NONCE_BYTES)
-            if value not in _storage:
-                break
 
-        _storage[value] = (False, _now() + NONCE_TTL)
-        return Nonce(nonce=value)
+@router.post("/batch", response_model=NonceBatch, status_code=status.HTTP_201_CREATED)
+async def issue_nonce_batch(count: int = Query(8, ge=1, le=NONCE_BATCH_MAX)) -> NonceBatch:
+    """
+    Issue `count` fresh nonces in one call, for clients that keep a prefetch pool.
+    Each is independent and single-use, with the same TTL as POST /nonce.
+    """
+    nonces = await asyncio.gather(*(_new_nonce() for _ in range(count)))
+    return NonceBatch(nonces=list(nonces), ttl=NONCE_TTL)
 
 
 @router.post("/confirm", status_code=status.HTTP_204_NO_CONTENT)
@@ -55,13 +56,24 @@ async def confirm_nonce(body: Nonce) -> None:
     Mark the provided nonce as used and immediately remove it.
     - 404 if not found or expired
     """
-    async with _lock:
-        await _cleanup_expired()
+    if not await store.confirm(body.nonce):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="nonce not found or expired")
 
-        rec = _storage.pop(body.nonce, None)
-        if rec is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="nonce not found or expired")
-
-        # if record existed — just confirm once and delete
-        return
 
+@router.post("/consume", status_code=status.HTTP_204_NO_CONTENT)
+async def consume_signed_nonce(body: Nonce) -> None:
+    """
+    Shared replay state for signed nonces minted by other services.
+    - 404 if the signature is invalid or it has expired
+    - 409 if it was already consumed
+    """
+    if not NONCE_SIGNING_SECRET:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="signed nonces are disabled")
+    try:
+        nid, exp = verify_signed_nonce(body.nonce, NONCE_SIGNING_SECRET)
+    except InvalidNonce:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="nonce not found or expired")
+
+    # remembered only until the nonce would expire anyway
+    if not await store.issue("signed:" + nid, exp - time.time()):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="nonce already used")
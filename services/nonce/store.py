@@ -0,0 +1,134 @@
+import time
+import heapq
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+
+def _now() -> float:
+    return time.time()
+
+
+class NonceStore:
+    """Storage for single-use nonces."""
+
+    async def issue(self, value: str, ttl: float) -> bool:
+        """Store an unused nonce for `ttl` seconds. False if the value is already live."""
+        raise NotImplementedError
+
+    async def confirm(self, value: str) -> bool:
+        """Consume a nonce. False if it is unknown, already used or expired."""
+        raise NotImplementedError
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryNonceStore(NonceStore):
+    """
+    In-process nonce store. Only valid for a single worker process.
+    - issue: O(log n) (dict insert + heap push)
+    - confirm: O(1) (dict pop + expiry check)
+    - expired entries are removed by sweep() from the head of a min-heap
+      ordered by expiry, run periodically by a background task.
+    All methods are plain dict/heap work without awaits inside, so on a
+    single event loop they are atomic and need no lock.
+    """
+
+    def __init__(self, sweep_interval: float) -> None:
+        self._expires: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._sweeper = Sweeper(self, sweep_interval)
+
+    async def start(self) -> None:
+        self._sweeper.start()
+
+    async def close(self) -> None:
+        await self._sweeper.stop()
+
+    async def issue(self, value: str, ttl: float) -> bool:
+        now = _now()
+        exp = self._expires.get(value)
+        if exp is not None and exp > now:
+            return False
+        exp = now + ttl
+        self._expires[value] = exp
+        heapq.heappush(self._heap, (exp, value))
+        return True
+
+    async def confirm(self, value: str) -> bool:
+        exp = self._expires.pop(value, None)
+        return exp is not None and exp > _now()
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop expired nonces. Heap entries of already confirmed nonces are discarded too."""
+        now = _now() if now is None else now
+        removed = 0
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            exp, value = heapq.heappop(heap)
+            if self._expires.get(value) == exp:
+                del self._expires[value]
+                removed += 1
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+
+class Sweeper:
+    """Background task calling store.sweep() every `interval` seconds."""
+
+    def __init__(self, store: MemoryNonceStore, interval: float) -> None:
+        self.store = store
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="nonce-sweeper")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.store.sweep()
+
+
+class RedisNonceStore(NonceStore):
+    """
+    Nonce store shared by all workers and replicas.
+    - issue: SET key 1 NX PX ttl  (atomic "create if absent" with expiry)
+    - confirm: GETDEL key         (atomic single use; needs Redis >= 6.2)
+    Redis expires keys itself, so no sweeper is needed.
+    """
+
+    def __init__(self, url: str, prefix: str = "nonce:") -> None:
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(url)
+        self._prefix = prefix
+
+    async def issue(self, value: str, ttl: float) -> bool:
+        return bool(await self._redis.set(self._prefix + value, b"1", nx=True, px=max(1, int(ttl * 1000))))
+
+    async def confirm(self, value: str) -> bool:
+        return await self._redis.getdel(self._prefix + value) is not None
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def build_store(backend: str, sweep_interval: float, redis_url: str, redis_prefix: str) -> NonceStore:
+    if backend == "redis":
+        return RedisNonceStore(redis_url, redis_prefix)
+    if backend == "memory":
+        return MemoryNonceStore(sweep_interval)
+    raise ValueError(f"Unknown NONCE_STORE: {backend}")
@@ -1,5 +1,6 @@
 from datetime import datetime
 from uuid import UUID
+from typing import List, Optional
 from pydantic import BaseModel, constr
 
 
@@ -20,6 +21,10 @@ class VerifyAccessIn(BaseModel):
     access_key: str
 
 
+class VerifyAccessBatchIn(BaseModel):
+    items: List[VerifyAccessIn]
+
+
 # -------- Output --------
 
 class TokenPairOut(BaseModel):
@@ -27,3 +32,13 @@ class TokenPairOut(BaseModel):
     refresh_token: str
     token_type: str = "bearer"
 
+
+class VerifyAccessResult(BaseModel):
+    user_id: UUID
+    ok: bool
+    status_code: int = 200      # what POST /verify-access would have answered
+    detail: Optional[str] = None
+
+
+class VerifyAccessBatchOut(BaseModel):
+    results: List[VerifyAccessResult]  # same order as the request items
@@ -1,6 +1,7 @@
 import uuid
+from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from strenum import StrEnum
 
 
@@ -27,3 +28,12 @@ class MediaUrl(BaseModel):
     media_id: uuid.UUID
     url: str
 
+
+class MediaIdsIn(BaseModel):
+    ids: List[uuid.UUID] = Field(default_factory=list)
+    variant: Optional[str] = None
+
+
+class MediaUrls(BaseModel):
+    urls: List[MediaUrl]
+
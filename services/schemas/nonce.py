@@ -1,5 +1,10 @@
+from typing import List
 from pydantic import BaseModel
 
 class Nonce(BaseModel):
     nonce: str
 
+
+class NonceBatch(BaseModel):
+    nonces: List[str]
+    ttl: int  # seconds each nonce stays valid from issuance
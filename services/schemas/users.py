@@ -1,4 +1,5 @@
 from uuid import UUID
+from typing import List
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -13,4 +14,6 @@ class UserOut(BaseModel):
 class TokenIn(BaseModel):
     access_token: str
 
-    
\ No newline at end of file
+
+class UserIdsIn(BaseModel):
+    ids: List[UUID]
@@ -0,0 +1,73 @@
+import hmac
+import time
+import hashlib
+import secrets
+from typing import Dict, Optional, Set, Tuple
+
+# sn1.<id hex>.<exp unix>.<hmac-sha256 hex>
+PREFIX = "sn1"
+
+
+class InvalidNonce(ValueError):
+    """Signed nonce is malformed, forged or expired."""
+
+
+def _sign(secret: str, body: str) -> str:
+    return hmac.new(secret.encode("utf8"), body.encode("utf8"), hashlib.sha256).hexdigest()
+
+
+def is_signed(nonce: str) -> bool:
+    return nonce.startswith(PREFIX + ".")
+
+
+def mint(secret: str, ttl: float, id_bytes: int = 16) -> str:
+    """Self-describing nonce: random id + expiry, authenticated with HMAC. No network call."""
+    body = f"{PREFIX}.{secrets.token_hex(id_bytes)}.{int(time.time() + ttl)}"
+    return f"{body}.{_sign(secret, body)}"
+
+
+def verify(nonce: str, secret: str, now: Optional[float] = None) -> Tuple[str, int]:
+    """Check signature and expiry. Returns (id, exp). Does NOT check single use."""
+    try:
+        prefix, nid, exp_s, sig = nonce.split(".")
+        exp = int(exp_s)
+    except ValueError:
+        raise InvalidNonce("Malformed nonce")
+    if prefix != PREFIX:
+        raise InvalidNonce("Unknown nonce format")
+    if not hmac.compare_digest(sig, _sign(secret, f"{prefix}.{nid}.{exp_s}")):
+        raise InvalidNonce("Bad nonce signature")
+    if exp <= (time.time() if now is None else now):
+        raise InvalidNonce("Nonce expired")
+    return nid, exp
+
+
+class ReplayFilter:
+    """
+    Remembers used nonce ids until they expire.
+    Ids are kept in time buckets by expiry (exp // bucket_seconds); a whole
+    bucket is dropped once everything in it has expired, so memory is bounded
+    by the nonces used within one TTL window.
+    """
+
+    def __init__(self, bucket_seconds: int = 5) -> None:
+        self.bucket_seconds = bucket_seconds
+        self._buckets: Dict[int, Set[str]] = {}
+
+    def _prune(self, now: float) -> None:
+        stale = [b for b in self._buckets if (b + 1) * self.bucket_seconds <= now]
+        for b in stale:
+            del self._buckets[b]
+
+    def add(self, nid: str, exp: int, now: Optional[float] = None) -> bool:
+        """Record a use. False if this id was already used (replay)."""
+        self._prune(time.time() if now is None else now)
+        # a given id always has the same exp (it's signed), hence the same bucket
+        bucket = self._buckets.setdefault(exp // self.bucket_seconds, set())
+        if nid in bucket:
+            return False
+        bucket.add(nid)
+        return True
+
+    def __len__(self) -> int:
+        return sum(len(b) for b in self._buckets.values())
@@ -6,17 +6,21 @@ from fastapi import APIRouter, Depends, Body, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 
 from .db.session import get_db
 from .models.user import User
 from .models.refresh_token import RefreshToken
-from ..schemas.auth import TokenPairOut, RefreshIn, VerifyAccessIn
+from ..schemas.auth import (
+    TokenPairOut, RefreshIn, VerifyAccessIn,
+    VerifyAccessBatchIn, VerifyAccessBatchOut, VerifyAccessResult)
 from .security import (
-    verify_password, create_access_token,
-    create_refresh_token_raw, hash_refresh_token,
-    verify_refresh_token, now_utc,
-    jwt_decode, require_token_type)
+    verify_password_async, create_access_token,
+    create_refresh_token, split_refresh_token,
+    verify_refresh_verifier, verify_refresh_token_async, now_utc,
+    jwt_decode, require_token_type, user_claims)
 from .deps import get_current_user
+from .users import USERS_BATCH_MAX
 
 
 REFRESH_EXPIRES_DAYS = int(os.getenv("REFRESH_EXPIRES_DAYS", "14"))
@@ -38,64 +42,85 @@ async def verify_access(user_id: str, access_key: str) -> bool:
             raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                                 detail="Users service unavailable")
 
+async def _find_refresh_token(db: AsyncSession, user_id: uuid.UUID, refresh_token: str) -> Optional[RefreshToken]:
+    """Active refresh token row matching the raw token, or None."""
+    selector, verifier = split_refresh_token(refresh_token)
+    if selector is not None:
+        # one indexed lookup + one HMAC, independent of the number of sessions
+        t = (
+            await db.execute(select(RefreshToken).where(RefreshToken.selector == selector))
+        ).scalar_one_or_none()
+        if (
+            t is None
+            or t.user_id != user_id
+            or t.revoked
+            or t.expires_at < now_utc()
+            or not verify_refresh_verifier(verifier, t.token_hash)
+        ):
+            return None
+        return t
+
+    # Legacy token (issued before selectors): bcrypt-check each active one.
+    # It gets rotated to the new format on its next refresh.
+    candidates = (
+        await db.execute(
+            select(RefreshToken).where(
+                RefreshToken.user_id == user_id,
+                RefreshToken.selector.is_(None),
+                RefreshToken.revoked == False,
+                RefreshToken.expires_at >= now_utc(),
+            )
+        )
+    ).scalars().all()
+    for t in candidates:
+        if await verify_refresh_token_async(refresh_token, t.token_hash):
+            return t
+    return None
+
+def _new_refresh_token(db: AsyncSession, user_id: uuid.UUID, parent_id: Optional[uuid.UUID] = None) -> str:
+    """Add a refresh token row to the session and return the raw token for the client."""
+    raw, selector, verifier_hash = create_refresh_token()
+    db.add(
+        RefreshToken(
+            user_id=user_id,
+            parent_id=parent_id,
+            selector=selector,
+            token_hash=verifier_hash,
+            expires_at=now_utc() + timedelta(days=REFRESH_EXPIRES_DAYS),
+        )
+    )
+    return raw
+
 @router.post("/token", response_model=TokenPairOut)
 async def token(form: OAuth2PasswordRequestForm = Depends(),
                 db: AsyncSession = Depends(get_db)):
     # username/password login
     user = (await db.execute(select(User).where(User.username == form.username))).scalar_one_or_none()
-    if not user or not verify_password(form.password, user.password_hash):
+    if not user or not await verify_password_async(form.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
     if not user.is_active:
         raise HTTPException(status_code=403, detail="User is inactive")
 
     # issue access
-    access = create_access_token(sub=str(user.id))
+    access = create_access_token(sub=str(user.id), claims=user_claims(user))
 
     # issue refresh (rotate any existing if you want single-session)
-    raw = create_refresh_token_raw()
-    rt = RefreshToken(
-        user_id=user.id,
-        token_hash=hash_refresh_token(raw),
-        expires_at=now_utc() + timedelta(days=REFRESH_EXPIRES_DAYS)  
-    )
-    db.add(rt)
+    raw = _new_refresh_token(db, user.id)
     await db.commit()
     return TokenPairOut(access_token=access, refresh_token=raw)
 
 @router.post("/token/refresh", response_model=TokenPairOut)
 async def refresh(payload: RefreshIn = Body(...), db: AsyncSession = Depends(get_db)):
-    candidates = (
-        await db.execute(
-            select(RefreshToken).where(
-                RefreshToken.user_id == payload.user_id,
-                RefreshToken.revoked == False,           
-                RefreshToken.expires_at >= now_utc(),
-            )
-        )
-    ).scalars().all()
-
-    matched = None
-    for t in candidates:
-        if verify_refresh_token(payload.refresh_token, t.token_hash):
-            matched = t
-            break
-
+    matched = await _find_refresh_token(db, payload.user_id, payload.refresh_token)
     if not matched:
         raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
 
     # Rotate only the matched token
     matched.revoked = True
-    new_secret = create_refresh_token_raw()
-    db.add(
-        RefreshToken(
-            user_id=matched.user_id,
-            parent_id=matched.id,
-            token_hash=hash_refresh_token(new_secret),
-            expires_at=now_utc() + timedelta(days=REFRESH_EXPIRES_DAYS),
-        )
-    )
+    new_secret = _new_refresh_token(db, matched.user_id, parent_id=matched.id)
 
-    access = create_access_token(sub=str(matched.user_id))
+    user = await db.get(User, matched.user_id)
+    access = create_access_token(sub=str(matched.user_id), claims=user_claims(user) if user else None)
     await db.commit()
     return TokenPairOut(access_token=access, refresh_token=new_secret)
 
@@ -105,8 +130,22 @@ async def verify_access(payload: VerifyAccessIn, db: AsyncSession = Depends(get_
     Single source of truth for user verification.
     - Verifies the access JWT (signature, exp, token_type)
     - Verifies that sub in the token equals provided user_id
-    - Verifies that the user exists
+    - Verifies that the user exists (404) and is active (403)
     """
+    _check_access_token(payload)
+
+    # 3) user must exist and be active
+    res = await db.execute(select(User.is_active).where(User.id == payload.user_id))
+    is_active = res.scalar_one_or_none()
+    if is_active is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not is_active:
+        raise HTTPException(status_code=403, detail="User is inactive")
+
+    return {"ok": True}
+
+def _check_access_token(payload: VerifyAccessIn) -> None:
+    """Token checks of /verify-access that need no database. Raises 401."""
     # 1) fully validate token (signature, exp)
     claims = jwt_decode(payload.access_key)
     require_token_type(claims, expected="access")
@@ -121,32 +160,38 @@ async def verify_access(payload: VerifyAccessIn, db: AsyncSession = Depends(get_
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid subject format")
 
-    # 3) user must exist
-    res = await db.execute(select(User).where(User.id == payload.user_id))
-    if not res.scalar_one_or_none():
-        raise HTTPException(status_code=404, detail="User not found")
+@router.post("/verify-access/batch", response_model=VerifyAccessBatchOut)
+async def verify_access_batch(payload: VerifyAccessBatchIn, db: AsyncSession = Depends(get_db)):
+    """
+    /verify-access for many (user_id, access_key) pairs at once.
+    Tokens are checked in-process, then all user ids in one IN query.
+    Always 200; each result carries the status /verify-access would have returned.
+    """
+    if len(payload.items) > USERS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {USERS_BATCH_MAX} items per request")
 
-    return {"ok": True}
+    results = []
+    for item in payload.items:
+        try:
+            _check_access_token(item)
+            results.append(VerifyAccessResult(user_id=item.user_id, ok=True))
+        except HTTPException as e:
+            results.append(VerifyAccessResult(user_id=item.user_id, ok=False, status_code=e.status_code, detail=e.detail))
+
+    ids = {r.user_id for r in results if r.ok}
+    if ids:
+        active = dict((await db.execute(select(User.id, User.is_active).where(User.id.in_(ids)))).all())
+        for r in results:
+            if r.ok and r.user_id not in active:
+                r.ok, r.status_code, r.detail = False, 404, "User not found"
+            elif r.ok and not active[r.user_id]:
+                r.ok, r.status_code, r.detail = False, 403, "User is inactive"
+    return VerifyAccessBatchOut(results=results)
 
 @router.post("/logout")
 async def logout(payload: RefreshIn = Body(...), db: AsyncSession = Depends(get_db)):
-    # 1) Get all active tokens for this user
-    candidates = (
-        await db.execute(
-            select(RefreshToken).where(
-                RefreshToken.user_id == payload.user_id,
-                RefreshToken.revoked == False,        
-                RefreshToken.expires_at >= now_utc(),
-            )
-        )
-    ).scalars().all()
-
-    # 2) Find the one matching the provided secret
-    matched = None
-    for t in candidates:
-        if verify_refresh_token(payload.refresh_token, t.token_hash):
-            matched = t
-            break
+    # 1) Find the active token matching the provided secret
+    matched = await _find_refresh_token(db, payload.user_id, payload.refresh_token)
 
     if not matched:
         raise HTTPException(
@@ -154,7 +199,7 @@ async def logout(payload: RefreshIn = Body(...), db: AsyncSession = Depends(get_
             detail="Refresh token not found or already revoked",
         )
 
-    # 3) Revoke just this token
+    # 2) Revoke just this token
     matched.revoked = True
     await db.commit()
 
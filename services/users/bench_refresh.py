@@ -0,0 +1,52 @@
+"""
+Refresh-token verification cost vs number of active sessions.
+
+    python -m services.users.bench_refresh [max_sessions]
+
+Compares the legacy scheme (bcrypt-check every active token until one
+matches; worst case = the presented token is checked last) with
+selector.verifier tokens (index lookup + one HMAC). The database round trip
+is the same for both and is left out; the index is modelled with a dict.
+"""
+import sys
+import time
+
+from .security import (
+    create_refresh_token, create_refresh_token_raw, hash_refresh_token,
+    split_refresh_token, verify_refresh_token, verify_refresh_verifier,
+)
+
+
+def _legacy(n: int) -> float:
+    raws = [create_refresh_token_raw() for _ in range(n)]
+    hashes = [hash_refresh_token(r) for r in raws]
+    presented = raws[-1]
+    start = time.perf_counter()
+    for h in hashes:
+        if verify_refresh_token(presented, h):
+            break
+    return time.perf_counter() - start
+
+
+def _selector(n: int, rounds: int = 1000) -> float:
+    rows = {}
+    raw = None
+    for _ in range(n):
+        raw, selector, verifier_hash = create_refresh_token()
+        rows[selector] = verifier_hash
+    start = time.perf_counter()
+    for _ in range(rounds):
+        selector, verifier = split_refresh_token(raw)
+        assert verify_refresh_verifier(verifier, rows[selector])
+    return (time.perf_counter() - start) / rounds
+
+
+def main() -> None:
+    max_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f"{'sessions':>8} {'legacy ms':>10} {'selector ms':>12}")
+    for n in (1, 5, 10, max_sessions):
+        print(f"{n:>8} {_legacy(n) * 1000:>10.1f} {_selector(n) * 1000:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
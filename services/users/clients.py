@@ -0,0 +1,7 @@
+import os
+from ..http_clients import ClientRegistry
+
+USERS_SERVICE_BASE = os.getenv("USERS_SERVICE_BASE", "http://185.106.95.104:8000")
+
+clients = ClientRegistry()
+clients.register("users", USERS_SERVICE_BASE, timeout=5.0)
@@ -10,17 +10,20 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from .db.session import get_db
 from .models.user import User
+from .clients import clients
+from .security import jwt_decode, require_token_type
 
 auth_scheme = OAuth2PasswordBearer(tokenUrl="/token")
-USERS_SERVICE_BASE = os.getenv("USERS_SERVICE_BASE", "http://185.106.95.104:8000")
+# local: verify the JWT in-process; remote: call USERS_SERVICE_BASE/users/verify-access
+USERS_VERIFY_MODE = os.getenv("USERS_VERIFY_MODE", "local")
 
 async def _users_verify_access(user_id: uuid.UUID, access_key: str) -> None:
-    url = f"{USERS_SERVICE_BASE}/users/verify-access"
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        try:
-            r = await client.post(url, json={"user_id": str(user_id), "access_key": access_key})
-        except httpx.RequestError:
-            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Users service unavailable")
+    try:
+        r = await clients.get("users").post(
+            "/users/verify-access", json={"user_id": str(user_id), "access_key": access_key}
+        )
+    except httpx.RequestError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Users service unavailable")
     if r.status_code != 200:
         if r.status_code in (400, 401, 403, 404):
             raise HTTPException(status_code=r.status_code, detail=r.json().get("detail", "Access denied"))
@@ -34,19 +37,32 @@ def _extract_sub_unverified(token: str) -> uuid.UUID:
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Malformed access token")
 
+def _verify_access_local(token: str) -> uuid.UUID:
+    claims = jwt_decode(token)
+    require_token_type(claims, expected="access")
+    try:
+        return uuid.UUID(claims.get("sub"))
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
+
 async def resolve_user_from_token(token: str, db: AsyncSession) -> User:
     """
-    1) Read user_id from token (unverified).
-    2) Verify access remotely via Users service.
-    3) Load user profile from DB and return it.
+    1) Verify the token: in-process (USERS_VERIFY_MODE=local), or read user_id
+       unverified and verify access remotely via Users service.
+    2) Load user profile from DB and return it.
     """
-    uid = _extract_sub_unverified(token)
-    await _users_verify_access(uid, token)
+    if USERS_VERIFY_MODE == "local":
+        uid = _verify_access_local(token)
+    else:
+        uid = _extract_sub_unverified(token)
+        await _users_verify_access(uid, token)
 
     result = await db.execute(select(User).where(User.id == uid))
     user = result.scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is inactive")
     return user
 
 async def get_current_user(
@@ -0,0 +1,78 @@
+"""
+Mixed load against a running users service: concurrent logins (bcrypt)
+alongside /verify-access calls, reporting verify-access latency and how many
+logins were shed with 503.
+
+    python -m services.users.load_test --base http://localhost:8002/v1 \\
+        --username alice --password secret123 --logins 200 --verifies 1000
+
+The user must already exist. With bcrypt on the event loop, verify-access
+p95 climbs to roughly (concurrent logins x bcrypt cost); with password_pool it
+should stay close to its unloaded latency.
+"""
+import time
+import asyncio
+import argparse
+from collections import Counter
+from typing import List
+
+import httpx
+
+
+def _pct(samples: List[float], p: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * p))] * 1000 if s else 0.0
+
+
+async def _login(client: httpx.AsyncClient, args, codes: Counter) -> None:
+    r = await client.post("/users/token", data={"username": args.username, "password": args.password})
+    codes[r.status_code] += 1
+
+
+async def _verify(client: httpx.AsyncClient, body: dict, latencies: List[float], codes: Counter) -> None:
+    start = time.perf_counter()
+    r = await client.post("/users/verify-access", json=body)
+    latencies.append(time.perf_counter() - start)
+    codes[r.status_code] += 1
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base", default="http://localhost:8002/v1")
+    ap.add_argument("--username", required=True)
+    ap.add_argument("--password", required=True)
+    ap.add_argument("--logins", type=int, default=200)
+    ap.add_argument("--verifies", type=int, default=1000)
+    args = ap.parse_args()
+
+    limits = httpx.Limits(max_connections=args.logins + 50)
+    async with httpx.AsyncClient(base_url=args.base, timeout=60.0, limits=limits) as client:
+        r = await client.post("/users/token", data={"username": args.username, "password": args.password})
+        r.raise_for_status()
+        access = r.json()["access_token"]
+        me = (await client.get("/users/me", headers={"Authorization": f"Bearer {access}"})).json()
+        body = {"user_id": me["id"], "access_key": access}
+
+        # baseline
+        base_lat: List[float] = []
+        for _ in range(20):
+            await _verify(client, body, base_lat, Counter())
+
+        login_codes: Counter = Counter()
+        verify_codes: Counter = Counter()
+        latencies: List[float] = []
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(_login(client, args, login_codes) for _ in range(args.logins)),
+            *(_verify(client, body, latencies, verify_codes) for _ in range(args.verifies)),
+        )
+        elapsed = time.perf_counter() - start
+
+    print(f"baseline verify-access p50={_pct(base_lat, .5):.1f}ms")
+    print(f"under load ({elapsed:.1f}s): verify-access p50={_pct(latencies, .5):.1f}ms "
+          f"p95={_pct(latencies, .95):.1f}ms p99={_pct(latencies, .99):.1f}ms codes={dict(verify_codes)}")
+    print(f"logins: {dict(login_codes)} (503 = shed by password_pool)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
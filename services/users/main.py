@@ -5,12 +5,24 @@ from .users import router as urouter
 from .auth import router as arouter
 from fastapi import FastAPI
 from .db.session import init_db
+from .clients import clients
+from .security import password_pool
 
 app = FastAPI(title="Users Service")
 
 @app.on_event("startup")
 async def on_startup() -> None:
     await init_db()
+    clients.start()
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await clients.aclose()
+    password_pool.shutdown()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> dict:
+    return {"password_pool": password_pool.stats()}
 
 app.include_router(urouter, prefix="/v1/users")
 app.include_router(arouter, prefix="/v1/users")
@@ -16,6 +16,8 @@ class RefreshToken(Base):
         ForeignKey("users.id", ondelete="CASCADE"),
         index=True
     )
+    # public half of "<selector>.<verifier>" tokens; NULL for legacy (bcrypt-hashed) tokens
+    selector: Mapped[str | None] = mapped_column(String(32), unique=True, index=True, nullable=True)
     token_hash: Mapped[str] = mapped_column(String(255), index=True)
     expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
     revoked: Mapped[bool] = mapped_column(Boolean, default=False, server_default="0")
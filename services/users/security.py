@@ -1,12 +1,15 @@
+import hmac
+import hashlib
 import secrets
 import base64
 import bcrypt   
-import jwt
 import os
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
 from fastapi import HTTPException, status
+from ..jwt_keys import KeyRing
+from ..executors import BoundedExecutor, ExecutorSaturated
 
 
 JWT_SECRET = os.getenv("JWT_SECRET", "jwt-secret")
@@ -14,6 +17,19 @@ JWT_ALG = os.getenv("JWT_ALG", "HS256")
 ACCESS_EXPIRES_MIN = int(os.getenv("ACCESS_EXPIRES_MIN", "15"))
 REFRESH_EXPIRES_DAYS = int(os.getenv("REFRESH_EXPIRES_DAYS", "14"))
 REFRESH_TOKEN_BYTES = int(os.getenv("REFRESH_TOKEN_BYTES", "64"))
+REFRESH_SELECTOR_BYTES = 12
+# key for the refresh verifier HMAC; rotating it invalidates all selector-format refresh tokens
+REFRESH_TOKEN_PEPPER = os.getenv("REFRESH_TOKEN_PEPPER", JWT_SECRET)
+
+# bcrypt is deliberately slow (and releases the GIL), so it runs in its own
+# thread pool; when PASSWORD_MAX_PENDING jobs are already waiting, callers get
+# a fast 503 instead of piling up behind logins
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "32"))
+password_pool = BoundedExecutor("password", PASSWORD_WORKERS, max_pending=PASSWORD_MAX_PENDING)
+
+# JWT_SECRET plus optional rotating keys (JWT_KEYS / JWT_ACTIVE_KID)
+access_keys = KeyRing.from_env()
 
 
 # ---------- Password helpers ----------
@@ -24,6 +40,24 @@ def verify_password(p: str, h: str) -> bool:
     hash_value = base64.b64decode(h.encode("utf8"))
     return bcrypt.checkpw(p.encode("utf8"), hash_value)
 
+async def _run_password_job(fn, *args):
+    try:
+        return await password_pool.run(fn, *args)
+    except ExecutorSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent password operations, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+async def hash_password_async(p: str) -> str:
+    """hash_password in password_pool; 503 when the pool is saturated."""
+    return await _run_password_job(hash_password, p)
+
+async def verify_password_async(p: str, h: str) -> bool:
+    """verify_password in password_pool; 503 when the pool is saturated."""
+    return await _run_password_job(verify_password, p, h)
+
 
 # ---------- Time ----------
 def now_utc() -> datetime:
@@ -31,15 +65,46 @@ def now_utc() -> datetime:
 
 
 # ---------- Access token (JWT) ----------
-def create_access_token(sub: str) -> str:
+def create_access_token(sub: str, claims: Optional[Dict[str, Any]] = None) -> str:
     exp = now_utc() + timedelta(minutes=ACCESS_EXPIRES_MIN)
-    payload: Dict[str, Any] = {"sub": sub, "exp": int(exp.timestamp()), "typ": "access"}
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
+    payload: Dict[str, Any] = {**(claims or {}), "sub": sub, "exp": int(exp.timestamp()), "typ": "access"}
+    return access_keys.encode(payload)
+
+def user_claims(user) -> Dict[str, Any]:
+    """Profile claims that let other services build UserOut without calling us."""
+    return {
+        "username": user.username,
+        "is_active": user.is_active,
+        "created_at": user.created_at.isoformat(),
+    }
 
 
 # ---------- Refresh token (opaque string) ----------
+# Format: "<selector>.<verifier>". The selector is stored in clear (indexed) and
+# finds the row directly; the verifier is high-entropy random, so a keyed
+# SHA-256 is enough to protect it at rest (no need for bcrypt's slowness).
+# Legacy tokens have no selector and a bcrypt token_hash.
+def create_refresh_token() -> Tuple[str, str, str]:
+    """New refresh token. Returns (raw token for the client, selector, verifier hash)."""
+    selector = secrets.token_urlsafe(REFRESH_SELECTOR_BYTES)
+    verifier = secrets.token_urlsafe(REFRESH_TOKEN_BYTES)
+    return f"{selector}.{verifier}", selector, hash_refresh_verifier(verifier)
+
+def split_refresh_token(rt: str) -> Tuple[Optional[str], str]:
+    """(selector, verifier); selector is None for legacy tokens."""
+    selector, sep, verifier = rt.partition(".")
+    if not sep:
+        return None, rt
+    return selector, verifier
+
+def hash_refresh_verifier(verifier: str) -> str:
+    return hmac.new(REFRESH_TOKEN_PEPPER.encode("utf8"), verifier.encode("utf8"), hashlib.sha256).hexdigest()
+
+def verify_refresh_verifier(verifier: str, h: str) -> bool:
+    return hmac.compare_digest(hash_refresh_verifier(verifier), h)
+
 def create_refresh_token_raw() -> str:
-    # random, URL-safe string; send to client, store only a hash server-side
+    # legacy format: random, URL-safe string; send to client, store only a hash server-side
     return secrets.token_urlsafe(REFRESH_TOKEN_BYTES)
 
 def hash_refresh_token(rt: str) -> str:
@@ -48,12 +113,15 @@ def hash_refresh_token(rt: str) -> str:
 def verify_refresh_token(rt: str, h: str) -> bool:
     return verify_password(rt, h)
 
+async def verify_refresh_token_async(rt: str, h: str) -> bool:
+    return await verify_password_async(rt, h)
+
 
 # ---------- Decode & validate JWT ----------
 def jwt_decode(token: str) -> Dict[str, Any]:
     """Decode JWT (access or any JWT you issue). Raises 401 on failure."""
     try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        return access_keys.decode(token)
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
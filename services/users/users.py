@@ -1,3 +1,4 @@
+import os
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -5,19 +6,22 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from .deps import get_current_user, resolve_user_from_token
 from .db.session import get_db
 from .models.user import User
-from ..schemas.users import UserOut, TokenIn
+from typing import List
+from ..schemas.users import UserOut, TokenIn, UserIdsIn
 from ..schemas.auth import RegisterIn
-from .security import hash_password
+from .security import hash_password_async
 
 router = APIRouter(tags=["users"])
 
+USERS_BATCH_MAX = int(os.getenv("USERS_BATCH_MAX", "100"))
+
 @router.post("/register", status_code=201)
 async def register(payload: RegisterIn, db: AsyncSession = Depends(get_db)):
     exists = await db.scalar(select(func.count()).select_from(User).where(User.username == payload.username))
     if exists:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already taken")
 
-    user = User(username=payload.username, password_hash=hash_password(payload.password))
+    user = User(username=payload.username, password_hash=await hash_password_async(payload.password))
     db.add(user)
     await db.commit()
     return {"message": "User created"}
@@ -53,3 +57,23 @@ async def get_user(
         is_active=user.is_active,
         created_at=user.created_at,
     )
+
+@router.post("/batch", response_model=List[UserOut])
+async def get_users_batch(payload: UserIdsIn, db: AsyncSession = Depends(get_db)) -> List[UserOut]:
+    """
+    Look up many users by id in a single query.
+    Returned in request order; unknown ids are left out.
+    """
+    if len(payload.ids) > USERS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {USERS_BATCH_MAX} ids per request")
+    if not payload.ids:
+        return []
+
+    rows = (await db.execute(select(User).where(User.id.in_(set(payload.ids))))).scalars().all()
+    by_id = {u.id: u for u in rows}
+    return [
+        UserOut(id=u.id, username=u.username, is_active=u.is_active, created_at=u.created_at)
+        for u in (by_id.get(i) for i in dict.fromkeys(payload.ids))
+        if u is not None
+    ]
+
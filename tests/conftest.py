@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# services create their engines and storage at import time; point them at scratch space
+_scratch = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_scratch}/services.db")
+os.environ.setdefault("MEDIA_STORAGE", "local")
+os.environ.setdefault("MEDIA_LOCAL_ROOT", f"{_scratch}/media")
+
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def media_client():
+    """TestClient of the media service (sqlite + LocalStorage), authenticated as one user."""
+    from fastapi.testclient import TestClient
+    from services.media.main import app
+    from services.media.media_enums import PrincipalMode
+    from services.media.security import Principal, get_principal
+
+    user_id = str(uuid.uuid4())
+    app.dependency_overrides[get_principal] = lambda: Principal(mode=PrincipalMode.USER, user_id=user_id)
+    try:
+        with TestClient(app) as client:
+            client.headers["X-Chat-Id"] = str(uuid.uuid4())
+            yield client
+    finally:
+        app.dependency_overrides.clear()
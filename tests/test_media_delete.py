@@ -0,0 +1,57 @@
+"""Cache invalidation of DELETE /media/{id} (sqlite + LocalStorage)."""
+import io
+import uuid
+
+from PIL import Image
+from sqlalchemy import update
+
+from services.media import media
+from services.media.db.session import SessionLocal
+from services.media.models.image import Image as ImageModel
+
+
+def _upload(client) -> str:
+    out = io.BytesIO()
+    Image.frombytes("L", (4, 4), uuid.uuid4().bytes).save(out, format="PNG")
+    r = client.post("/v1/media", files={"file": ("a.png", out.getvalue(), "image/png")})
+    assert r.status_code == 201
+    return r.json()["id"]
+
+
+def test_delete_drops_the_cached_row(media_client):
+    media_id = _upload(media_client)
+    assert media_client.get(f"/v1/media/{media_id}").status_code == 200
+    assert media.meta_cache.get(uuid.UUID(media_id)) is not None
+
+    assert media_client.delete(f"/v1/media/{media_id}").status_code == 204
+    assert media.meta_cache.get(uuid.UUID(media_id)) is None
+    assert media_client.get(f"/v1/media/{media_id}").status_code == 404
+    assert media_client.get(f"/v1/media/{media_id}/content").status_code == 404
+
+
+def test_row_read_before_a_delete_commits_is_not_cached(media_client):
+    media_id = uuid.UUID(_upload(media_client))
+
+    async def delete_committed():
+        async with SessionLocal() as db:
+            await db.execute(update(ImageModel).where(ImageModel.id == media_id).values(is_deleted=True))
+            await db.commit()
+        media._forget_image(media_id)
+
+    async def load_racing_delete():
+        async with SessionLocal() as db:
+            execute = db.execute
+
+            async def execute_then_delete(*args, **kwargs):
+                res = await execute(*args, **kwargs)
+                # the live row is on its way to the cache when the delete lands
+                await delete_committed()
+                return res
+
+            db.execute = execute_then_delete
+            return await media._load_image(db, media_id)
+
+    img = media_client.portal.call(load_racing_delete)
+    assert img.id == media_id
+    assert media.meta_cache.get(media_id) is None
+    assert media_client.get(f"/v1/media/{media_id}").status_code == 404
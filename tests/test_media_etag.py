@@ -0,0 +1,67 @@
+"""ETag / If-None-Match handling of GET /media/{id} and /content (sqlite + LocalStorage)."""
+import hashlib
+import io
+
+from PIL import Image
+
+from services.media import media
+
+
+def _upload(client, size=(1500, 300)):
+    out = io.BytesIO()
+    Image.new("RGB", size, (30, 30, 200)).save(out, format="PNG")
+    data = out.getvalue()
+    r = client.post("/v1/media", files={"file": ("img.png", data, "image/png")})
+    assert r.status_code == 201
+    return r.json()["id"], hashlib.sha256(data).hexdigest()
+
+
+def test_content_etag_is_the_sha256(media_client):
+    media_id, sha = _upload(media_client)
+    r = media_client.get(f"/v1/media/{media_id}/content")
+    assert r.status_code == 200
+    assert r.headers["etag"] == f'"{sha}"'
+
+    r = media_client.get(f"/v1/media/{media_id}/content", headers={"If-None-Match": f'W/"{sha}"'})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == f'"{sha}"'
+    assert r.headers["cache-control"] == f"public, max-age={media.MEDIA_CONTENT_MAX_AGE}"
+
+
+def test_variant_revalidation_does_not_resolve_the_variant(media_client, monkeypatch):
+    media_id, sha = _upload(media_client)
+    r = media_client.get(f"/v1/media/{media_id}/content", params={"variant": "hd"})
+    assert r.status_code == 200
+    assert r.headers["etag"] == f'"{sha}.hd"'
+
+    async def no_lookup(*args):
+        raise AssertionError("variant resolved for a 304")
+
+    monkeypatch.setattr(media, "variant_key", no_lookup)
+    r = media_client.get(
+        f"/v1/media/{media_id}/content", params={"variant": "hd"},
+        headers={"If-None-Match": f'"other", "{sha}.hd"'},
+    )
+    assert r.status_code == 304
+
+
+def test_other_variant_etag_does_not_match(media_client):
+    media_id, sha = _upload(media_client)
+    r = media_client.get(
+        f"/v1/media/{media_id}/content", params={"variant": "llm"},
+        headers={"If-None-Match": f'"{sha}.hd"'},
+    )
+    assert r.status_code == 200
+    assert r.headers["etag"] == f'"{sha}.llm"'
+
+
+def test_meta_etag(media_client):
+    media_id, sha = _upload(media_client)
+    r = media_client.get(f"/v1/media/{media_id}")
+    assert r.status_code == 200
+    assert r.headers["etag"] == f'"meta-{sha}"'
+    assert r.headers["cache-control"] == f"public, max-age={media.MEDIA_META_MAX_AGE}"
+
+    r = media_client.get(f"/v1/media/{media_id}", headers={"If-None-Match": r.headers["etag"]})
+    assert r.status_code == 304
@@ -0,0 +1,67 @@
+"""MediaGC against a storage backend that refuses some deletes (sqlite + LocalStorage)."""
+import io
+import uuid
+
+from PIL import Image
+from sqlalchemy import select, text
+
+from services.media import gc
+from services.media.db.session import SessionLocal, engine
+from services.media.models.image import Image as ImageModel
+from services.media.storage import StorageDeleteError
+
+
+class RefusingStorage:
+    """Deletes through the real backend, except `refused` keys (as S3 reports them in Errors)."""
+
+    def __init__(self, backend, refused):
+        self.backend = backend
+        self.refused = set(refused)
+
+    async def delete(self, keys):
+        failed = [k for k in keys if k in self.refused]
+        await self.backend.delete([k for k in keys if k not in self.refused])
+        if failed:
+            raise StorageDeleteError(failed, "AccessDenied")
+
+
+def _upload(client) -> str:
+    out = io.BytesIO()
+    Image.frombytes("L", (4, 4), uuid.uuid4().bytes).save(out, format="PNG")
+    r = client.post("/v1/media", files={"file": ("a.png", out.getvalue(), "image/png")})
+    assert r.status_code == 201
+    return r.json()["id"]
+
+
+async def _keys(ids):
+    async with SessionLocal() as db:
+        res = await db.execute(select(ImageModel.id, ImageModel.storage_url).where(ImageModel.id.in_(ids)))
+        return dict(res.all())
+
+
+async def _create_message_images():
+    # lives in the chats database, which defaults to the media one
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE IF NOT EXISTS message_images (image_id CHAR(32))"))
+
+
+def test_failed_delete_keeps_only_its_batch(media_client, monkeypatch):
+    media_client.portal.call(_create_message_images)
+    ids = [uuid.UUID(_upload(media_client)) for _ in range(3)]
+    keys = media_client.portal.call(_keys, ids)
+    stuck = ids[1]
+
+    storage = RefusingStorage(gc.storage, [keys[stuck]])
+    monkeypatch.setattr(gc, "storage", storage)
+    monkeypatch.setattr(gc.media_gc, "grace", -1)
+    monkeypatch.setattr(gc.media_gc, "batch_size", 1)
+
+    run = media_client.portal.call(gc.media_gc.run_once)
+    assert run["progress"]["delete_failed"] == 1
+    # the other batches were still collected
+    assert list(media_client.portal.call(_keys, ids)) == [stuck]
+
+    storage.refused.clear()
+    run = media_client.portal.call(gc.media_gc.run_once)
+    assert run["progress"]["delete_failed"] == 0
+    assert media_client.portal.call(_keys, ids) == {}
@@ -0,0 +1,38 @@
+"""POST /media size limits (sqlite + LocalStorage)."""
+import asyncio
+import io
+import os
+
+from fastapi import UploadFile, HTTPException
+import pytest
+
+from services.media import media
+from services.media.storage import storage
+
+
+def _stored_files():
+    return [f for _, _, files in os.walk(storage.root) for f in files]
+
+
+def test_oversized_upload_is_rejected_with_413(media_client, monkeypatch):
+    monkeypatch.setattr(media, "MAX_UPLOAD_BYTES", 1000)
+    before = _stored_files()
+    r = media_client.post("/v1/media", files={"file": ("big.png", b"x" * 1001, "image/png")})
+    assert r.status_code == 413
+    assert _stored_files() == before
+
+
+def test_oversized_upload_of_unknown_size_is_rejected_while_reading(monkeypatch):
+    # no Content-Length on the part: the limit is enforced by the hashing pass
+    monkeypatch.setattr(media, "MAX_UPLOAD_BYTES", 1000)
+    monkeypatch.setattr(media, "UPLOAD_CHUNK_BYTES", 256)
+    upload = UploadFile(io.BytesIO(b"x" * 1001))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(media._inspect_upload(upload))
+    assert exc.value.status_code == 413
+
+
+def test_upload_at_the_limit_is_accepted(media_client, monkeypatch):
+    monkeypatch.setattr(media, "MAX_UPLOAD_BYTES", 1000)
+    r = media_client.post("/v1/media", files={"file": ("ok.bin", b"y" * 1000, "application/octet-stream")})
+    assert r.status_code == 201
@@ -0,0 +1,99 @@
+"""Resized variants of GET /media/{id}/content (sqlite + LocalStorage)."""
+import hashlib
+import io
+
+from PIL import Image
+from sqlalchemy import select
+
+from services.media import derivatives, media
+from services.media.db.session import SessionLocal
+from services.media.models.image_variant import ImageVariant
+
+
+def _png(width: int, height: int) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(out, format="PNG")
+    return out.getvalue()
+
+
+def _upload(client, data: bytes) -> str:
+    r = client.post("/v1/media", files={"file": ("img.png", data, "image/png")})
+    assert r.status_code == 201
+    return r.json()["id"]
+
+
+def _count_renders(monkeypatch) -> list:
+    calls = []
+    run = derivatives.image_pool.run
+
+    async def counting_run(fn, *args):
+        calls.append(fn)
+        return await run(fn, *args)
+
+    monkeypatch.setattr(derivatives.image_pool, "run", counting_run)
+    return calls
+
+
+async def _variant_rows():
+    async with SessionLocal() as db:
+        res = await db.execute(select(ImageVariant.source_key, ImageVariant.variant))
+        return res.all()
+
+
+def test_variant_is_rendered_once_and_reused(media_client, monkeypatch):
+    renders = _count_renders(monkeypatch)
+    media_id = _upload(media_client, _png(1500, 300))
+    before = set(media_client.portal.call(_variant_rows))
+
+    first = media_client.get(f"/v1/media/{media_id}/content", params={"variant": "llm"})
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "image/webp"
+    assert first.headers["cache-control"] == f"public, max-age={media.MEDIA_CONTENT_MAX_AGE}"
+    with Image.open(io.BytesIO(first.content)) as im:
+        assert im.size == (1024, 205)
+
+    second = media_client.get(f"/v1/media/{media_id}/content", params={"variant": "llm"})
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert len(renders) == 1
+
+    added = set(media_client.portal.call(_variant_rows)) - before
+    assert [v for _, v in added] == ["llm"]
+
+
+def test_small_image_is_its_own_variant(media_client, monkeypatch):
+    renders = _count_renders(monkeypatch)
+    data = _png(200, 100)
+    media_id = _upload(media_client, data)
+
+    r = media_client.get(f"/v1/media/{media_id}/content", params={"variant": "llm"})
+    assert r.status_code == 200
+    assert r.content == data
+    assert r.headers["content-type"] == "image/png"
+    assert renders == []
+
+
+def test_unrenderable_variant_serves_original_under_its_own_etag(media_client, monkeypatch):
+    renders = _count_renders(monkeypatch)
+    # a valid header (1500x300) followed by garbage: the size sniffs, decoding fails
+    data = _png(1500, 300)[:64] + b"\0" * 256
+    media_id = _upload(media_client, data)
+    rows = media_client.portal.call(_variant_rows)
+    sha = hashlib.sha256(data).hexdigest()
+
+    r = media_client.get(f"/v1/media/{media_id}/content", params={"variant": "llm"})
+    assert r.status_code == 200
+    assert r.content == data
+    assert r.headers["content-type"] == "image/png"
+    assert r.headers["etag"] == f'"{sha}"'
+    assert r.headers["cache-control"] == f"public, max-age={media.MEDIA_FALLBACK_MAX_AGE}"
+
+    # not remembered as the variant: a revalidation retries the render
+    r = media_client.get(
+        f"/v1/media/{media_id}/content", params={"variant": "llm"},
+        headers={"If-None-Match": r.headers["etag"]},
+    )
+    assert r.status_code == 304
+    assert r.headers["cache-control"] == f"public, max-age={media.MEDIA_FALLBACK_MAX_AGE}"
+    assert len(renders) == 2
+    assert media_client.portal.call(_variant_rows) == rows
@@ -0,0 +1,104 @@
+"""chats NoncePool against a fake nonce-service."""
+import asyncio
+import itertools
+
+import pytest
+
+from services.chats import nonces
+from services.chats.nonces import NoncePool
+
+
+class FakeNonceService:
+    def __init__(self, delay: float = 0.05, ttl: int = 30) -> None:
+        self.delay = delay
+        self.ttl = ttl
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._ids = itertools.count()
+
+    async def post(self, path, params):
+        assert path == "/nonce/batch"
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return FakeResponse({"nonces": [f"n{next(self._ids)}" for _ in range(params["count"])], "ttl": self.ttl})
+
+
+class FakeResponse:
+    def __init__(self, data) -> None:
+        self._data = data
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self):
+        return self._data
+
+
+@pytest.fixture
+def service(monkeypatch):
+    fake = FakeNonceService()
+    monkeypatch.setattr(nonces.clients, "get", lambda name: fake)
+    return fake
+
+
+def test_concurrent_misses_share_one_fetch_at_a_time(service):
+    async def case():
+        pool = NoncePool(size=8, low_water=4, margin=5)
+        taken = await asyncio.gather(*(pool.take() for _ in range(20)))
+        await pool.close()
+        return pool, taken
+
+    pool, taken = asyncio.run(case())
+    assert len(set(taken)) == 20
+    # one fetch at a time, shared by all waiters, instead of one per caller
+    assert service.max_in_flight == 1
+    assert service.calls < 20
+    assert pool.misses == 20
+
+
+def test_refill_in_background_keeps_hits(service):
+    async def case():
+        pool = NoncePool(size=8, low_water=4, margin=5)
+        await pool.take()
+        for _ in range(3):
+            await pool.take()
+        await asyncio.sleep(service.delay * 2)
+        return pool
+
+    pool = asyncio.run(case())
+    assert pool.misses == 1 and pool.hits == 3
+    assert service.calls == 2
+    assert pool.stats()["size"] == 8
+
+
+def test_batch_that_expires_within_margin_is_an_error(service):
+    service.ttl = 1
+
+    async def case():
+        pool = NoncePool(size=4, low_water=2, margin=5)
+        with pytest.raises(RuntimeError):
+            await pool.take()
+        await pool.close()
+
+    asyncio.run(case())
+
+
+def test_close_waits_for_cancelled_refill(service):
+    service.delay = 10
+
+    async def case():
+        pool = NoncePool(size=4, low_water=2, margin=5)
+        task = pool._start_fetch()
+        await asyncio.sleep(0)
+        await pool.close()
+        # finished by the time close() returns, not just asked to cancel
+        assert task.done() and task.cancelled()
+        assert service.in_flight == 0
+
+    asyncio.run(case())
@@ -0,0 +1,85 @@
+"""MemoryNonceStore and RedisNonceStore go through the same cases."""
+import asyncio
+
+import pytest
+
+from services.nonce.store import MemoryNonceStore, RedisNonceStore
+
+
+def _memory_store():
+    return MemoryNonceStore(sweep_interval=60.0)
+
+
+def _redis_store():
+    fakeredis = pytest.importorskip("fakeredis")
+    store = RedisNonceStore("redis://localhost:6379/0", prefix="test-nonce:")
+    store._redis = fakeredis.FakeAsyncRedis()
+    return store
+
+
+@pytest.fixture(params=[_memory_store, _redis_store], ids=["memory", "redis"])
+def run(request):
+    """Run a coroutine function with a fresh store on its own event loop."""
+    def _run(case):
+        async def main():
+            store = request.param()
+            await store.start()
+            try:
+                return await case(store)
+            finally:
+                await store.close()
+        return asyncio.run(main())
+    return _run
+
+
+def test_issue_then_confirm_once(run):
+    async def case(store):
+        assert await store.issue("a", 30)
+        assert await store.confirm("a")
+        assert not await store.confirm("a")
+    run(case)
+
+
+def test_duplicate_issue_rejected(run):
+    async def case(store):
+        assert await store.issue("a", 30)
+        assert not await store.issue("a", 30)
+        assert await store.confirm("a")
+    run(case)
+
+
+def test_unknown_nonce_not_confirmed(run):
+    async def case(store):
+        assert not await store.confirm("never-issued")
+    run(case)
+
+
+def test_expired_nonce_not_confirmed(run):
+    async def case(store):
+        assert await store.issue("a", 0.05)
+        await asyncio.sleep(0.15)
+        assert not await store.confirm("a")
+        # an expired value may be issued again
+        assert await store.issue("a", 30)
+    run(case)
+
+
+def test_concurrent_confirms_succeed_once(run):
+    async def case(store):
+        assert await store.issue("a", 30)
+        results = await asyncio.gather(*(store.confirm("a") for _ in range(10)))
+        assert results.count(True) == 1
+    run(case)
+
+
+def test_memory_sweep_drops_only_expired():
+    async def case():
+        store = _memory_store()
+        await store.issue("old", 10)
+        await store.issue("new", 1000)
+        await store.issue("used", 10)
+        await store.confirm("used")
+        assert store.sweep(now=store._expires["old"] + 1) == 1
+        assert len(store) == 1
+        assert await store.confirm("new")
+    asyncio.run(case())
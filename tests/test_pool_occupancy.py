@@ -0,0 +1,96 @@
+"""
+The send path must not hold a pooled connection while the model runs:
+with a pool of POOL_SIZE connections and no overflow, SENDS concurrent
+sends whose LLM call takes LLM_SECONDS all succeed, and never more than
+POOL_SIZE connections are checked out at once.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from services.chats import messages
+from services.chats.db.base import Base
+from services.chats.models.chat import Chat as ChatModel
+from services.chats.models.chat_member import ChatMember
+from services.chats.core.domain.chat import Chat
+from services.chats.core.domain.message import Message
+from services.chats.core.domain.mytypes import Role
+from services.chats.schemas.message import MessageCreate
+from services.schemas.users import UserOut
+
+POOL_SIZE = 3
+SENDS = 24
+LLM_SECONDS = 0.3
+POOL_TIMEOUT = 1.0   # < LLM_SECONDS * SENDS / POOL_SIZE: holding connections would time out
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/chats.db",
+        pool_size=POOL_SIZE, max_overflow=0, pool_timeout=POOL_TIMEOUT,
+    )
+    occupancy = {"now": 0, "max": 0}
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _checkout(*_):
+        occupancy["now"] += 1
+        occupancy["max"] = max(occupancy["max"], occupancy["now"])
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def _checkin(*_):
+        occupancy["now"] -= 1
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    monkeypatch.setattr(messages, "SessionLocal", factory)
+    yield factory, engine, occupancy
+    asyncio.run(engine.dispose())
+
+
+def test_concurrent_sends_keep_pool_occupancy_bounded(session_factory, monkeypatch):
+    factory, engine, occupancy = session_factory
+    in_flight = {"now": 0, "max": 0}
+
+    async def slow_send(self, message):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(LLM_SECONDS)
+        in_flight["now"] -= 1
+        self.previous_response_id = f"resp-{uuid.uuid4()}"
+        return Message(Role.ASSISTANT, "ok")
+
+    monkeypatch.setattr(Chat, "send", slow_send)
+
+    user = UserOut(id=uuid.uuid4(), username="alice", is_active=True, created_at=datetime.now(timezone.utc))
+    chat_id = uuid.uuid4()
+
+    async def send(i: int):
+        async with factory() as db:
+            return await messages.send_message(
+                chat_id, MessageCreate(text=f"hello {i}"), stream=False, background=False,
+                db=db, current_user=user,
+            )
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with factory() as db:
+            db.add(ChatModel(id=chat_id, title="load", created_by=user.id))
+            db.add(ChatMember(chat_id=chat_id, user_id=user.id))
+            await db.commit()
+        occupancy["max"] = 0
+        return await asyncio.gather(*(send(i) for i in range(SENDS)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+    assert not errors, errors[:3]
+    assert all(r.text == "ok" for r in results)
+    # the model calls overlapped well beyond the pool size...
+    assert in_flight["max"] > POOL_SIZE
+    # ...while connections were only held for the short transactions around them
+    assert occupancy["max"] <= POOL_SIZE
@@ -0,0 +1,120 @@
+"""S3Storage.put_stream against a stub S3 client."""
+import asyncio
+import tempfile
+import tracemalloc
+
+import pytest
+from fastapi import UploadFile
+
+from services.media import storage as storage_mod
+from services.media.storage import S3Storage
+
+CHUNK = 64 * 1024
+PART = 1024 * 1024
+
+
+class StubS3:
+    class exceptions:
+        class NoSuchBucket(Exception):
+            pass
+
+    def __init__(self, fail_part: int = 0, fail_abort: bool = False) -> None:
+        self.calls = []
+        self.bodies = []       # sizes only, so the stub holds no upload data
+        self.fail_part = fail_part
+        self.fail_abort = fail_abort
+
+    async def put_object(self, Bucket, Key, Body, ContentType):
+        self.calls.append("put_object")
+        self.bodies.append(len(Body))
+
+    async def create_multipart_upload(self, Bucket, Key, ContentType):
+        self.calls.append("create_multipart_upload")
+        return {"UploadId": "up-1"}
+
+    async def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.calls.append("upload_part")
+        self.bodies.append(len(Body))
+        if PartNumber == self.fail_part:
+            raise ConnectionError("part upload failed")
+        return {"ETag": f'"etag-{PartNumber}"'}
+
+    async def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.calls.append("complete_multipart_upload")
+        self.completed_parts = MultipartUpload["Parts"]
+
+    async def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.calls.append("abort_multipart_upload")
+        if self.fail_abort:
+            raise ConnectionError("abort failed")
+
+
+@pytest.fixture(autouse=True)
+def small_parts(monkeypatch):
+    monkeypatch.setattr(storage_mod, "UPLOAD_CHUNK_BYTES", CHUNK)
+    monkeypatch.setattr(storage_mod, "UPLOAD_PART_BYTES", PART)
+
+
+def _upload(size: int) -> UploadFile:
+    f = tempfile.TemporaryFile()
+    block = b"x" * CHUNK
+    for _ in range(size // CHUNK):
+        f.write(block)
+    f.write(b"x" * (size % CHUNK))
+    f.seek(0)
+    return UploadFile(f, size=size)
+
+
+def _put(s3: StubS3, size: int) -> None:
+    backend = S3Storage()
+    backend._client = s3
+    asyncio.run(backend.put_stream("blobs/k", _upload(size), "image/png"))
+
+
+def test_small_body_is_one_put_object():
+    s3 = StubS3()
+    _put(s3, PART - 1)
+    assert s3.calls == ["put_object"]
+    assert s3.bodies == [PART - 1]
+
+
+def test_large_body_is_multipart():
+    s3 = StubS3()
+    size = 3 * PART + 1000
+    _put(s3, size)
+    assert s3.calls == ["create_multipart_upload"] + ["upload_part"] * 4 + ["complete_multipart_upload"]
+    assert [p["PartNumber"] for p in s3.completed_parts] == [1, 2, 3, 4]
+    assert sum(s3.bodies) == size
+    # never more than one part (plus the chunk that crossed the threshold) buffered
+    assert max(s3.bodies) < PART + CHUNK
+
+
+def test_failed_part_aborts_upload():
+    s3 = StubS3(fail_part=2)
+    with pytest.raises(ConnectionError, match="part upload failed"):
+        _put(s3, 3 * PART)
+    assert s3.calls[-1] == "abort_multipart_upload"
+    assert "complete_multipart_upload" not in s3.calls
+
+
+def test_failed_abort_keeps_original_error():
+    s3 = StubS3(fail_part=1, fail_abort=True)
+    with pytest.raises(ConnectionError, match="part upload failed"):
+        _put(s3, 2 * PART)
+    assert s3.calls[-1] == "abort_multipart_upload"
+
+
+def test_peak_memory_is_bounded_by_part_size():
+    size = 32 * PART
+    upload = _upload(size)
+    backend = S3Storage()
+    backend._client = StubS3()
+
+    tracemalloc.start()
+    try:
+        asyncio.run(backend.put_stream("blobs/k", upload, "image/png"))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # the part buffer and its bytes() copy, not the 32-part body
+    assert peak < 3 * PART
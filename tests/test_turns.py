@@ -0,0 +1,83 @@
+"""execute_turn records its outcome only while the turn is still RUNNING."""
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from services.chats import turns
+from services.chats.db.base import Base
+from services.chats.models.chat import Chat as ChatModel
+from services.chats.models.chat_member import ChatMember  # noqa: F401  (mapper of Chat.members)
+from services.chats.models.message import Message as MessageModel
+from services.chats.models.turn import Turn
+from services.chats.core.domain.mytypes import Role
+from services.chats.schemas.turn import TurnStatus
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/chats.db")
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    monkeypatch.setattr(turns, "SessionLocal", factory)
+    yield factory
+    asyncio.run(engine.dispose())
+
+
+async def _queued_turn(factory) -> uuid.UUID:
+    async with factory() as db:
+        await (await db.connection()).run_sync(Base.metadata.create_all)
+        user_id = uuid.uuid4()
+        chat = ChatModel(title="t", created_by=user_id)
+        db.add(chat)
+        await db.flush()
+        msg = MessageModel(chat_id=chat.id, author_id=user_id, role=Role.USER, text="hi")
+        db.add(msg)
+        await db.flush()
+        turn = Turn(chat_id=chat.id, author_id=user_id, message_id=msg.id)
+        db.add(turn)
+        await db.commit()
+        return turn.id
+
+
+async def _turn(factory, turn_id) -> Turn:
+    async with factory() as db:
+        return await db.get(Turn, turn_id)
+
+
+def test_turn_done(factory, monkeypatch):
+    async def answer(chat_id, payload):
+        return SimpleNamespace(id=None)
+
+    monkeypatch.setattr(turns, "generate_model_answer", answer)
+
+    async def case():
+        turn_id = await _queued_turn(factory)
+        await turns.execute_turn(turn_id)
+        return await _turn(factory, turn_id)
+
+    assert asyncio.run(case()).status == TurnStatus.DONE
+
+
+def test_reaped_turn_stays_failed(factory, monkeypatch):
+    async def case():
+        turn_id = await _queued_turn(factory)
+
+        async def slow_answer(chat_id, payload):
+            # the reaper gives up on the turn while the model is still running
+            async with factory() as db:
+                await db.execute(
+                    update(Turn).where(Turn.id == turn_id).values(status=TurnStatus.FAILED, error="Interrupted")
+                )
+                await db.commit()
+            return SimpleNamespace(id=None)
+
+        monkeypatch.setattr(turns, "generate_model_answer", slow_answer)
+        await turns.execute_turn(turn_id)
+        return await _turn(factory, turn_id)
+
+    turn = asyncio.run(case())
+    assert turn.status == TurnStatus.FAILED
+    assert turn.error == "Interrupted"